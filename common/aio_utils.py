@@ -0,0 +1,331 @@
+"""
+Asyncio mirror of the query functions in common.utils, same names and results.
+
+    import asyncio
+    from common import aio_utils
+
+    async def main():
+        # Closes the connections of this loop on exit
+        async with aio_utils.get_client():
+            return await asyncio.gather(
+                *(aio_utils.get_block(h) for h in range(from_h, to_h))
+            )
+
+    blocks = asyncio.run(main())
+"""
+import ast
+import asyncio
+import functools
+import time
+import typing
+
+import pandas as pd
+
+from common.retry_policy import get_tried_nodes, record_tried_node
+from common.rpc_client import AsyncRpcClient, RpcResultError
+from common.utils import (
+    AUTH,
+    NODE_POOL,
+    PAGE_WORKERS,
+    get_node_pool,
+    get_param_timeline,
+    get_retry_policy,
+)
+
+CLIENT = AsyncRpcClient(auth=AUTH)
+
+
+def get_client() -> AsyncRpcClient:
+    return CLIENT
+
+
+async def set_client(client: AsyncRpcClient):
+    """
+    Replaces the shared client, eg to change the concurrency bound or timeouts
+    """
+    global CLIENT
+    old_client, CLIENT = CLIENT, client
+    await old_client.close()
+
+
+def retry_rpc(endpoint: str):
+    """
+    Retries the decorated rpc coroutine with the retry policy of common.utils
+    :param endpoint: rpc endpoint the coroutine queries, its retries are budgeted
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await get_retry_policy().call_async(endpoint, fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def query(
+    endpoint: str,
+    payload: typing.Optional[dict] = None,
+    url: typing.Optional[str] = None,
+    paged: bool = False,
+):
+    """
+    Posts payload to endpoint of a node through the shared async client
+    :param endpoint: rpc query endpoint, eg "block/"
+    :param payload: json body of the query
+    :param url: query url of a node, picked from the node pool if None
+    :param paged: whether the query is a paginated one
+    :return: decoded json response
+    """
+    if url is not None:
+        return await CLIENT.post(url + endpoint, payload, paged=paged)
+
+    node = get_node_pool().acquire(exclude=get_tried_nodes())
+    record_tried_node(node)
+    start = time.perf_counter()
+    try:
+        resp = await CLIENT.post(f"{node}v1/query/{endpoint}", payload, paged=paged)
+    except Exception:
+        NODE_POOL.release(node, time.perf_counter() - start, False)
+        raise
+    NODE_POOL.release(node, time.perf_counter() - start, True)
+    return resp
+
+
+@retry_rpc("supply/")
+async def get_supply(height):
+    supply = await query("supply/", {"height": height})
+    return int(supply["total"])
+
+
+@retry_rpc("balance/")
+async def balance(address, height):
+    bal = await query("balance/", {"address": address, "height": height})
+    return int(bal["balance"])
+
+
+async def node_balance(address, height):
+    node_info = await get_node_info(address, height)
+
+    if "code" in node_info.keys():
+        return 0
+    return int(node_info["tokens"])
+
+
+async def get_output_address(address, height):
+    node_info = await get_node_info(address, height)
+
+    if "code" in node_info.keys():
+        return address
+    output_address = (
+        node_info["output_address"]
+        if "output_address" in node_info.keys() and node_info["output_address"] != ""
+        else address
+    )
+    return output_address
+
+
+@retry_rpc("node/")
+async def get_node_info(address: str, height: int):
+    return await query("node/", {"address": address, "height": height})
+
+
+@retry_rpc("block/")
+async def get_block(height: int):
+    """
+    :param height:
+    :return: dict, information at block height
+    """
+    return await query("block/", {"height": height})
+
+
+@retry_rpc("height/")
+async def get_last_block(url=None):
+    """
+    :return: dict, last POKT block information
+    """
+    return await query("height/", url=url)
+
+
+async def get_block_height(height: int):
+    block = await get_block(height)
+    return block["block_height"]
+
+
+async def get_block_ts(height: int):
+    """
+    Returns timestamp of block height
+    :param height:
+    :return: pd.Timestamp
+    """
+    block = await get_block(height)
+    return pd.Timestamp(block["block"]["header"]["time"], tz="utc")
+
+
+async def get_last_block_height(url=None):
+    last_block = await get_last_block(url=url)
+    return last_block["height"]
+
+
+@retry_rpc("allparams/")
+async def get_all_params(height: int):
+    return await query("allparams/", {"height": height})
+
+
+@retry_rpc("param/")
+async def query_param(height: int, key: str):
+    param = await query("param/", {"height": height, "key": key})
+    return param["param_value"]
+
+
+async def get_param(height: int, key: str):
+    """
+    Returns the value of param key at height, from the param timeline if enabled
+    """
+    timeline = get_param_timeline()
+    if timeline is not None and timeline.covers(height, key):
+        return timeline.get(key, height)
+    return await query_param(height, key)
+
+
+async def get_pip22_height(height: int):
+    param = await get_param(height, "gov/upgrade")
+    try:
+        features = ast.literal_eval(param)["value"]["Features"]
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return 69232
+    for feature in features:
+        if "RSCAL" in feature:
+            return int(feature.split(":")[1])
+    return 69232
+
+
+async def get_dao_allocation(height: int):
+    return float(await get_param(height, "pos/DAOAllocation"))
+
+
+async def get_proposer_percentage(height: int):
+    return float(await get_param(height, "pos/ProposerPercentage"))
+
+
+async def get_reward_percentage(height: int):
+    dao_allocation = await get_dao_allocation(height)
+    proposer_percentage = await get_proposer_percentage(height)
+    return 1 - (dao_allocation + proposer_percentage) / 100
+
+
+async def get_relay_to_tokens_multiplier(height: int):
+    """
+    Returns the relay to token multiplier
+    :param height:
+    :return: float
+    """
+    return float(await get_param(height, "pos/RelaysToTokensMultiplier"))
+
+
+async def get_page(endpoint: str, payload: dict, result_key: str):
+    """
+    Returns one page of a paginated query, with retries
+    :return: dict, the whole response of the page
+    """
+
+    async def query_once():
+        resp = await query(endpoint, payload, paged=True)
+        if result_key not in resp:
+            raise RpcResultError(result_key, endpoint)
+        if resp[result_key] is None:
+            resp[result_key] = []
+        return resp
+
+    return await get_retry_policy().call_async(endpoint, query_once)
+
+
+async def get_pages(
+    endpoint: str,
+    page_payload: typing.Callable[[int], dict],
+    result_key: str,
+    window: int = PAGE_WORKERS,
+) -> typing.List[dict]:
+    """
+    Async counterpart of utils.iter_pages, gathers the pages with up to window
+    of them in flight and concatenates them in page order
+    """
+    first_page = await get_page(endpoint, page_payload(1), result_key)
+    results = list(first_page[result_key])
+    total_pages = first_page.get("total_pages")
+    if total_pages is not None:
+        semaphore = asyncio.Semaphore(window)
+
+        async def get_page_bounded(page: int) -> dict:
+            async with semaphore:
+                return await get_page(endpoint, page_payload(page), result_key)
+
+        pages = await asyncio.gather(
+            *(get_page_bounded(page) for page in range(2, total_pages + 1))
+        )
+        for page in pages:
+            results += page[result_key]
+        return results
+
+    next_page, in_flight = 2, 1
+    while len(results):
+        pages = await asyncio.gather(
+            *(
+                get_page(endpoint, page_payload(page), result_key)
+                for page in range(next_page, next_page + in_flight)
+            )
+        )
+        for page in pages:
+            if not len(page[result_key]):
+                return results
+            results += page[result_key]
+        next_page += in_flight
+        in_flight = min(in_flight * 2, window)
+    return results
+
+
+async def get_txs(height: int):
+    return await get_pages(
+        "blocktxs/",
+        lambda page: {"height": height, "page": page, "per_page": 50000},
+        "txs",
+    )
+
+
+async def get_claims(height: int, address: str = ""):
+    return await get_pages(
+        "nodeclaims/",
+        lambda page: {
+            "height": height,
+            "page": page,
+            "per_page": 50000,
+            "address": address,
+        },
+        "result",
+    )
+
+
+async def get_account_txs(height: int, address: str = ""):
+    return await get_pages(
+        "accounttxs/",
+        lambda page: {
+            "address": address,
+            "height": height,
+            "page": page,
+            "per_page": 50000,
+        },
+        "txs",
+    )
+
+
+async def get_nodes(height: int):
+    return await get_pages(
+        "nodes/",
+        lambda page: {"height": height, "opts": {"page": page, "per_page": 50000}},
+        "result",
+    )
+
+
+async def get_inflation(height: int):
+    return await get_supply(height) - await get_supply(height - 1)
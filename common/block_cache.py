@@ -0,0 +1,171 @@
+"""
+On disk cache of rpc responses at finalized heights
+"""
+import json
+import sqlite3
+import threading
+import time
+import typing
+import zlib
+
+# Endpoints whose responses at a finalized height never change
+DEFAULT_ENDPOINTS = frozenset({"block/", "blocktxs/", "nodeclaims/"})
+
+
+class BlockCache:
+    """
+    Sqlite store of zlib compressed response bodies keyed by
+    (endpoint, height, params).
+
+    Only heights at least finality_depth blocks behind the tip are cached
+    since those can't change anymore. When the stored payloads grow past
+    max_bytes the least recently read entries are evicted.
+
+    Reads don't write, their access times are kept in memory and written in
+    one transaction every access_batch reads or before evicting.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fetch_tip: typing.Callable[[], int],
+        max_bytes: int = 2 * 1024**3,
+        finality_depth: int = 10,
+        endpoints: typing.Iterable[str] = DEFAULT_ENDPOINTS,
+        tip_ttl: float = 60,
+        access_batch: int = 256,
+    ):
+        """
+        :param path: sqlite file of the cache
+        :param fetch_tip: returns the height of the last block
+        :param max_bytes: max total size of the compressed payloads
+        :param finality_depth: blocks behind the tip a height must be to be cached
+        :param endpoints: rpc endpoints whose responses are cached
+        :param tip_ttl: seconds the tip is reused before it is fetched again
+        :param access_batch: reads whose access times are written at once
+        """
+        self.path = path
+        self.fetch_tip = fetch_tip
+        self.max_bytes = max_bytes
+        self.finality_depth = finality_depth
+        self.endpoints = frozenset(endpoints)
+        self.tip_ttl = tip_ttl
+        self.access_batch = access_batch
+        # Key -> last access time not yet written
+        self._accesses: typing.Dict[tuple, float] = {}
+        self._tip = 0
+        self._tip_time = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Commits don't wait for a fsync, only the last ones can be lost on a
+        # power failure, which a cache can afford
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+ endpoint TEXT NOT NULL, height INTEGER NOT NULL, params TEXT NOT NULL,
+ payload BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL,
+ PRIMARY KEY (endpoint, height, params))"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._conn.commit()
+        self.size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    @property
+    def safe_height(self) -> int:
+        """
+        Highest height that can be cached
+        """
+        if time.monotonic() - self._tip_time > self.tip_ttl:
+            self._tip, self._tip_time = self.fetch_tip(), time.monotonic()
+        return self._tip - self.finality_depth
+
+    def is_cacheable(self, endpoint: str, payload: typing.Optional[dict]) -> bool:
+        if endpoint not in self.endpoints or payload is None:
+            return False
+        height = payload.get("height")
+        # Height 0 is the tip
+        return isinstance(height, int) and 0 < height <= self.safe_height
+
+    def get(self, endpoint: str, payload: dict) -> typing.Optional[bytes]:
+        """
+        Returns the cached response body or None
+        """
+        key = (endpoint, payload["height"], json.dumps(payload, sort_keys=True))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM entries WHERE endpoint = ? AND height = ?"
+                " AND params = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._accesses[key] = time.time()
+            if len(self._accesses) >= self.access_batch:
+                self._write_accesses()
+                self._conn.commit()
+        return zlib.decompress(row[0])
+
+    def _write_accesses(self):
+        self._conn.executemany(
+            "UPDATE entries SET last_access = ? WHERE endpoint = ? AND height = ?"
+            " AND params = ?",
+            [(access, *key) for key, access in self._accesses.items()],
+        )
+        self._accesses = {}
+
+    def put(self, endpoint: str, payload: dict, content: bytes):
+        """
+        Stores a response body, evicting old entries if over max_bytes
+        """
+        compressed = zlib.compress(content)
+        key = (endpoint, payload["height"], json.dumps(payload, sort_keys=True))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM entries WHERE endpoint = ? AND height = ?"
+                " AND params = ?",
+                key,
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, compressed, len(compressed), time.time()),
+            )
+            self.size += len(compressed) - (row[0] if row is not None else 0)
+            if self.size > self.max_bytes:
+                self._write_accesses()
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Evict down to 90% so every put past the limit doesn't evict again
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            "SELECT endpoint, height, params, size FROM entries ORDER BY last_access"
+        )
+        evicted = []
+        for endpoint, height, params, size in rows:
+            if self.size <= target:
+                break
+            evicted.append((endpoint, height, params))
+            self.size -= size
+        self._conn.executemany(
+            "DELETE FROM entries WHERE endpoint = ? AND height = ? AND params = ?",
+            evicted,
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._accesses = {}
+            self.size = 0
+
+    def close(self):
+        with self._lock:
+            self._write_accesses()
+            self._conn.commit()
+            self._conn.close()
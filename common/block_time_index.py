@@ -0,0 +1,166 @@
+"""
+Persistent index of block times used to resolve timestamps to heights
+"""
+import bisect
+import json
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# First height the index looks at, blocks before it have unreliable times
+FIRST_HEIGHT = 42052
+
+
+class BlockTimeIndex:
+    """
+    Sorted (height, block time) points of the chain.
+
+    A timestamp is resolved by interpolating between the two indexed points
+    around it, fetching the block time at the guessed height and adding it to
+    the index until the two points around the timestamp are adjacent heights.
+    Block times only grow with height so every resolved timestamp leaves its
+    answer in the index and resolving it again costs no network call.
+    """
+
+    def __init__(
+        self,
+        fetch_block_time: typing.Callable[[int], pd.Timestamp],
+        fetch_tip: typing.Callable[[], int],
+        path: typing.Optional[str] = None,
+        first_height: int = FIRST_HEIGHT,
+    ):
+        """
+        :param fetch_block_time: returns the block time of a height
+        :param fetch_tip: returns the height of the last block
+        :param path: json file the index is loaded from and saved to
+        :param first_height: lowest height of the index
+        """
+        self.fetch_block_time = fetch_block_time
+        self.fetch_tip = fetch_tip
+        self.path = path
+        self.first_height = first_height
+        self.heights: typing.List[int] = []
+        # Block times as ns since epoch, same order as heights
+        self.times: typing.List[int] = []
+        self._lock = threading.RLock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.heights)
+
+    def load(self):
+        with open(self.path) as f:
+            content = json.load(f)
+        with self._lock:
+            self.heights, self.times = content["heights"], content["times"]
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            content = {"heights": list(self.heights), "times": list(self.times)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, height: int, block_time: int):
+        with self._lock:
+            index = bisect.bisect_left(self.heights, height)
+            if index < len(self.heights) and self.heights[index] == height:
+                return
+            self.heights.insert(index, height)
+            self.times.insert(index, block_time)
+
+    def _fetch(self, height: int) -> int:
+        block_time = self.fetch_block_time(height).value
+        self.add(height, block_time)
+        return block_time
+
+    def build(self, step: int = 96, workers: int = 8):
+        """
+        Indexes every step heights from first_height up to the tip,
+        96 heights are about a day of blocks
+        """
+        self.extend(step=step, workers=workers)
+
+    def extend(self, step: int = 96, workers: int = 8):
+        """
+        Indexes every step heights from the last indexed height up to the tip
+        """
+        start = self.heights[-1] if len(self.heights) else self.first_height
+        tip = self.fetch_tip()
+        heights = list(range(start, tip, step)) + [tip]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self._fetch, heights))
+        self.save()
+
+    def height_at(self, ts: pd.Timestamp) -> int:
+        """
+        Returns the first height with a block time at or after ts,
+        the last height if there is none
+        """
+        height, added = self._height_at(ts.value)
+        if added:
+            self.save()
+        return height
+
+    def heights_at(self, timestamps: typing.Iterable[pd.Timestamp]) -> typing.List[int]:
+        """
+        Resolves many timestamps in one pass over the index in time order,
+        saves it once
+        :return: list, the heights in the order of timestamps
+        """
+        timestamps = list(timestamps)
+        heights, added = [0] * len(timestamps), False
+        for i in sorted(range(len(timestamps)), key=timestamps.__getitem__):
+            heights[i], has_added = self._height_at(timestamps[i].value)
+            added = added or has_added
+        if added:
+            self.save()
+        return heights
+
+    def _height_at(self, target: int) -> typing.Tuple[int, bool]:
+        added = False
+        if not len(self.heights):
+            self._fetch(self.first_height)
+            added = True
+        if target > self.times[-1]:
+            tip = self.fetch_tip()
+            if tip > self.heights[-1]:
+                self._fetch(tip)
+                added = True
+            if target > self.times[-1]:
+                return self.heights[-1], added
+
+        with self._lock:
+            index = bisect.bisect_left(self.times, target)
+            if index == 0:
+                return self.heights[0], added
+            low_height, low_time = self.heights[index - 1], self.times[index - 1]
+            high_height, high_time = self.heights[index], self.times[index]
+
+        bisect_next = False
+        while high_height - low_height > 1:
+            width = high_height - low_height
+            if bisect_next:
+                guess = (low_height + high_height) // 2
+            else:
+                guess = low_height + (target - low_time) * width // (
+                    high_time - low_time
+                )
+                guess = min(max(guess, low_height + 1), high_height - 1)
+            block_time = self._fetch(guess)
+            added = True
+            if block_time < target:
+                low_height, low_time = guess, block_time
+            else:
+                high_height, high_time = guess, block_time
+            # Bisect next if interpolating didn't halve the range so the search
+            # never takes much more probes than a binary search would
+            bisect_next = not bisect_next and high_height - low_height > width // 2
+        return high_height, added
@@ -1,15 +1,24 @@
+import asyncio
 import enum
+import itertools
 import json
-from contextlib import contextmanager
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
 from itertools import chain
 from os import environ
-from typing import List
+from typing import Dict, List, Optional, Tuple, Union
 
 import psycopg2
 import sqlalchemy
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
+from common.pg_pool import PgConnectionPool
+
 
 # Basic
 
@@ -17,10 +26,73 @@ from sqlalchemy.orm import sessionmaker, Session
 class PostgresInterface(enum.Enum):
     SQLALCHEMY_ENGINE = 0
     PSYCOPG2_DRIVER = 1
+    SQLALCHEMY_ASYNC = 2
+
+
+class DatabaseConnectionMode(enum.IntEnum):
+    WRITE = 0
+    READ = 1
 
 
 INTERFACE: PostgresInterface = PostgresInterface.SQLALCHEMY_ENGINE
 
+# Engines and psycopg2 pools shared by every connection of the process, by
+# (env, creds file, interface, host, loop), host is the index in get_hosts and
+# loop the event loop of an async engine, None for the others
+ENGINES: Dict[
+    Tuple[str, str, PostgresInterface, int, Optional[asyncio.AbstractEventLoop]],
+    Union[sqlalchemy.engine.Engine, AsyncEngine, PgConnectionPool],
+] = {}
+ENGINES_LOCK = threading.Lock()
+
+# Sizing of the psycopg2 pools, overridden by the pool_min_size, pool_max_size
+# and pool_max_lifetime keys of a creds file
+PSYCOPG2_POOL_MIN_SIZE = 1
+PSYCOPG2_POOL_MAX_SIZE = 10
+PSYCOPG2_POOL_MAX_LIFETIME = 3600
+
+# (env, creds file) -> creds of the primary followed by the ones of its replicas
+HOSTS: Dict[Tuple[str, str], List[dict]] = {}
+# Replicas lagging more seconds than this are skipped by READ connections
+REPLICA_MAX_LAG = 10
+# Seconds a measured lag is trusted for before being measured again
+REPLICA_LAG_TTL = 5
+# Seconds after which a measured lag is unknown, its replica skipped until
+# measured again
+REPLICA_LAG_EXPIRY = 30
+# Seconds to connect to a replica and to measure its lag, at least 2
+REPLICA_LAG_TIMEOUT = 2
+# 0 when every received change was replayed, otherwise the age of the last replayed
+REPLICA_LAG_QUERY = """SELECT CASE
+ WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+ ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+ END"""
+# (env, creds file, host) -> (monotonic time of the measure, lag in seconds)
+REPLICA_LAGS: Dict[Tuple[str, str, int], Tuple[float, float]] = {}
+# (env, creds file) whose replicas are being measured by a background thread
+REPLICA_LAGS_MEASURING = set()
+REPLICA_COUNTER = itertools.count()
+
+
+def _reset_engines_after_fork():
+    """
+    Drops the pooled connections inherited from the parent in a forked child
+    without closing them, they are still used by the parent, and the replica
+    lags, whose measuring threads didn't follow in the child
+    """
+    global ENGINES_LOCK
+    ENGINES_LOCK = threading.Lock()
+    REPLICA_LAGS.clear()
+    REPLICA_LAGS_MEASURING.clear()
+    for engine in ENGINES.values():
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_engines_after_fork)
+
 
 class ConnFactory:
     """
@@ -59,6 +131,295 @@ class ConnFactory:
         )
         return engine
 
+    @staticmethod
+    def get_async_engine(content: dict) -> AsyncEngine:
+        """
+        Same as get_engine over asyncpg, its connections belong to the event
+        loop they were opened in
+        """
+        return create_async_engine(
+            f"postgresql+asyncpg://{content['user']}:{content['password']}"
+            f"@{content['host']}:{content['port']}/{content['database']}",
+            pool_size=10,
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_use_lifo=True,
+        )
+
+    @staticmethod
+    def read_creds(file_path: str) -> dict:
+        with open(file_path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def get_hosts(file_path: str) -> List[dict]:
+        """
+        Returns the creds of the primary at file_path followed by the ones of
+        its replicas, read once per env. Replicas are listed in the creds file
+        under "replicas" and take every key they don't set from the primary, eg
+        {"host": "primary", ..., "replicas": [{"host": "replica"}, ...]}
+        :param file_path: path of the creds file
+        """
+        key = (ConnFactory.env, file_path)
+        with ENGINES_LOCK:
+            hosts = HOSTS.get(key)
+            if hosts is None:
+                content = ConnFactory.read_creds(file_path)
+                replicas = content.pop("replicas", [])
+                hosts = HOSTS[key] = [content] + [
+                    {**content, **replica} for replica in replicas
+                ]
+            return hosts
+
+    @staticmethod
+    def _get_registered(
+        file_path: str,
+        interface_type: PostgresInterface,
+        host: int,
+        create,
+        loop: asyncio.AbstractEventLoop = None,
+    ):
+        content = ConnFactory.get_hosts(file_path)[host]
+        key = (ConnFactory.env, file_path, interface_type, host, loop)
+        with ENGINES_LOCK:
+            engine = ENGINES.get(key)
+            if engine is None:
+                engine = ENGINES[key] = create(content)
+            return engine
+
+    @staticmethod
+    def get_registered_engine(
+        file_path: str, host: int = 0
+    ) -> sqlalchemy.engine.Engine:
+        """
+        Returns the engine of the creds at file_path in the current env,
+        created on first use and shared afterwards so its pool is reused
+        :param file_path: path of the creds file
+        :param host: index in get_hosts, the primary by default
+        """
+        return ConnFactory._get_registered(
+            file_path, PostgresInterface.SQLALCHEMY_ENGINE, host, ConnFactory.get_engine
+        )
+
+    @staticmethod
+    def get_registered_async_engine(file_path: str, host: int = 0) -> AsyncEngine:
+        """
+        Returns the async engine of the creds at file_path in the current env
+        for the running event loop, created on first use and shared afterwards
+        by the sessions of the loop. Engines of loops that closed are dropped.
+        :param file_path: path of the creds file
+        :param host: index in get_hosts, the primary by default
+        """
+        loop = asyncio.get_running_loop()
+        with ENGINES_LOCK:
+            closed = [
+                key for key in ENGINES if key[4] is not None and key[4].is_closed()
+            ]
+            engines = [ENGINES.pop(key) for key in closed]
+        for engine in engines:
+            # Its connections can't be closed without their loop
+            engine.sync_engine.dispose(close=False)
+        return ConnFactory._get_registered(
+            file_path,
+            PostgresInterface.SQLALCHEMY_ASYNC,
+            host,
+            ConnFactory.get_async_engine,
+            loop=loop,
+        )
+
+    @staticmethod
+    def get_pool(content: dict) -> PgConnectionPool:
+        return PgConnectionPool(
+            lambda: psycopg2.connect(
+                database=content["database"],
+                user=content["user"],
+                password=content["password"],
+                host=content["host"],
+                port=content["port"],
+            ),
+            min_size=content.get("pool_min_size", PSYCOPG2_POOL_MIN_SIZE),
+            max_size=content.get("pool_max_size", PSYCOPG2_POOL_MAX_SIZE),
+            max_lifetime=content.get("pool_max_lifetime", PSYCOPG2_POOL_MAX_LIFETIME),
+        )
+
+    @staticmethod
+    def get_registered_pool(file_path: str, host: int = 0) -> PgConnectionPool:
+        """
+        Returns the psycopg2 pool of the creds at file_path in the current env,
+        created on first use and shared afterwards
+        :param file_path: path of the creds file
+        :param host: index in get_hosts, the primary by default
+        """
+        return ConnFactory._get_registered(
+            file_path, PostgresInterface.PSYCOPG2_DRIVER, host, ConnFactory.get_pool
+        )
+
+    @staticmethod
+    def _measure_lag(content: dict) -> float:
+        """
+        Measures the lag of a replica over a connection of its own, with short
+        timeouts so that a replica that can't be reached is given up quickly
+        :param content: creds of the replica
+        """
+        try:
+            conn = psycopg2.connect(
+                database=content["database"],
+                user=content["user"],
+                password=content["password"],
+                host=content["host"],
+                port=content["port"],
+                connect_timeout=REPLICA_LAG_TIMEOUT,
+                options=f"-c statement_timeout={REPLICA_LAG_TIMEOUT * 1000}",
+            )
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(REPLICA_LAG_QUERY)
+                    return float(cursor.fetchone()[0])
+            finally:
+                conn.close()
+        except Exception:
+            # Replicas that can't be reached are skipped as well
+            return float("inf")
+
+    @staticmethod
+    def _measure_lags(env: str, file_path: str, replicas: List[Tuple[int, dict]]):
+        try:
+            for host, content in replicas:
+                lag = ConnFactory._measure_lag(content)
+                REPLICA_LAGS[(env, file_path, host)] = (time.monotonic(), lag)
+        finally:
+            with ENGINES_LOCK:
+                REPLICA_LAGS_MEASURING.discard((env, file_path))
+
+    @staticmethod
+    def _stale_replicas(file_path: str) -> List[int]:
+        """
+        Returns the replicas of file_path whose lag wasn't measured in the last
+        REPLICA_LAG_TTL seconds
+        """
+        now = time.monotonic()
+        stale = []
+        for host in range(1, len(ConnFactory.get_hosts(file_path))):
+            measure = REPLICA_LAGS.get((ConnFactory.env, file_path, host))
+            if measure is None or now - measure[0] >= REPLICA_LAG_TTL:
+                stale.append(host)
+        return stale
+
+    @staticmethod
+    def _pick_replica(file_path: str) -> int:
+        """
+        Returns the next replica in round robin of those lagging at most
+        REPLICA_MAX_LAG seconds measured in the last REPLICA_LAG_EXPIRY seconds,
+        or the primary if none does
+        """
+        now = time.monotonic()
+        replicas = []
+        for host in range(1, len(ConnFactory.get_hosts(file_path))):
+            measure = REPLICA_LAGS.get((ConnFactory.env, file_path, host))
+            if (
+                measure is not None
+                and now - measure[0] <= REPLICA_LAG_EXPIRY
+                and measure[1] <= REPLICA_MAX_LAG
+            ):
+                replicas.append(host)
+        if not len(replicas):
+            return 0
+        return replicas[next(REPLICA_COUNTER) % len(replicas)]
+
+    @staticmethod
+    def choose_host(
+        file_path: str, mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE
+    ) -> int:
+        """
+        Returns the index in get_hosts of the host a connection goes to: the
+        primary for WRITE, for READ the next replica in round robin of those
+        lagging at most REPLICA_MAX_LAG seconds, or the primary if none does.
+
+        Lags older than REPLICA_LAG_TTL are measured again by one background
+        thread, the last known ones are used meanwhile unless older than
+        REPLICA_LAG_EXPIRY, so READ connections go to the primary until the
+        replicas were measured once.
+        :param file_path: path of the creds file
+        :param mode: DatabaseConnectionMode
+        """
+        if mode != DatabaseConnectionMode.READ:
+            return 0
+        stale = ConnFactory._stale_replicas(file_path)
+        if len(stale):
+            key = (ConnFactory.env, file_path)
+            with ENGINES_LOCK:
+                measure = key not in REPLICA_LAGS_MEASURING
+                REPLICA_LAGS_MEASURING.add(key)
+            if measure:
+                hosts = ConnFactory.get_hosts(file_path)
+                threading.Thread(
+                    target=ConnFactory._measure_lags,
+                    args=(*key, [(host, hosts[host]) for host in stale]),
+                    daemon=True,
+                ).start()
+        return ConnFactory._pick_replica(file_path)
+
+    @staticmethod
+    def prewarm(
+        file_name: str = "poktinfo_creds.json",
+        connections: int = 1,
+        interface_type: PostgresInterface = None,
+    ):
+        """
+        Opens connections of the engine or pool of file_name ahead of the first
+        query, they stay in the pool afterwards
+        :param file_name: name of the creds file in the creds directory
+        :param connections: number of connections to open, at most the pool size
+        :param interface_type: INTERFACE if None
+        """
+        file_path = ConnFactory.get_file_path(file_name)
+        interface_type = INTERFACE if interface_type is None else interface_type
+        if interface_type == PostgresInterface.PSYCOPG2_DRIVER:
+            ConnFactory.get_registered_pool(file_path).prewarm(connections)
+            return
+        engine = ConnFactory.get_registered_engine(file_path)
+        conns = [engine.connect() for _ in range(connections)]
+        for conn in conns:
+            conn.close()
+
+    @staticmethod
+    def dispose_all():
+        """
+        Closes the pooled connections of every engine and psycopg2 pool and
+        empties the registry. Connections of async engines can only be closed
+        from their event loop, they are dropped, see dispose_all_async
+        """
+        with ENGINES_LOCK:
+            engines = list(ENGINES.values())
+            ENGINES.clear()
+            HOSTS.clear()
+            REPLICA_LAGS.clear()
+        for engine in engines:
+            if isinstance(engine, AsyncEngine):
+                engine.sync_engine.dispose(close=False)
+            else:
+                engine.dispose()
+
+    @staticmethod
+    async def dispose_all_async():
+        """
+        Same as dispose_all, closing the connections of the async engines of
+        the running loop too
+        """
+        loop = asyncio.get_running_loop()
+        with ENGINES_LOCK:
+            engines = list(ENGINES.items())
+            ENGINES.clear()
+            HOSTS.clear()
+            REPLICA_LAGS.clear()
+        for key, engine in engines:
+            if isinstance(engine, AsyncEngine) and key[4] is loop:
+                await engine.dispose()
+            elif isinstance(engine, AsyncEngine):
+                engine.sync_engine.dispose(close=False)
+            else:
+                engine.dispose()
+
     @staticmethod
     def get_session(content: dict) -> sqlalchemy.orm.session.Session:
         engine = ConnFactory.get_engine(content)
@@ -69,20 +430,28 @@ class ConnFactory:
     def connect(
         file_path: str = "db_creds.json",
         interface_type: PostgresInterface = PostgresInterface.SQLALCHEMY_ENGINE,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+        host: int = None,
     ):
         """
-        Retrieves credentials from file_path and connects to db
+        Retrieves credentials from file_path and connects to db.
+        psycopg2 connections are not pooled, they are with the context managers
         :param file_path:
+        :param mode: READ connections may go to a replica, see choose_host
+        :param host: index in get_hosts of the host to connect to, chosen for
+            mode if None
         :return: conn to db
         """
-        content = json.load(open(file_path))
+        if host is None:
+            host = ConnFactory.choose_host(file_path, mode)
         # establishing the connection
         if interface_type == PostgresInterface.SQLALCHEMY_ENGINE:
-            engine = ConnFactory.get_engine(content)
+            engine = ConnFactory.get_registered_engine(file_path, host)
             session = Session(engine, autocommit=True)
             session.begin()
             return session
         elif interface_type == PostgresInterface.PSYCOPG2_DRIVER:
+            content = ConnFactory.get_hosts(file_path)[host]
             conn = psycopg2.connect(
                 database=content["database"],
                 user=content["user"],
@@ -93,54 +462,147 @@ class ConnFactory:
             # auto commits to avoid calling commit every time
             conn.autocommit = True
             return conn
+        elif interface_type == PostgresInterface.SQLALCHEMY_ASYNC:
+            engine = ConnFactory.get_registered_async_engine(file_path, host)
+            return AsyncSession(engine)
         return None
 
     @staticmethod
     def _yield_conn(
         file_name: str,
         interface_type: PostgresInterface = None,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
     ):
         conn = None
+        pool = None
         file_path = f"{ConnFactory.creds_directory}{file_name}"
+        interface_type = INTERFACE if interface_type is None else interface_type
         try:
-            conn = ConnFactory.connect(
-                file_path=file_path,
-                interface_type=INTERFACE if interface_type is None else interface_type,
-            )
+            host = ConnFactory.choose_host(file_path, mode)
+            if interface_type == PostgresInterface.PSYCOPG2_DRIVER:
+                pool = ConnFactory.get_registered_pool(file_path, host)
+                conn = pool.getconn()
+            else:
+                conn = ConnFactory.connect(
+                    file_path=file_path, interface_type=interface_type, host=host
+                )
             yield conn
         finally:
             if conn is not None:
+                # Set until the connection is known to be usable again
+                discard = True
                 try:
-                    conn.commit()
-                except Exception:
-                    conn.rollback()
-                conn.close()
+                    try:
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                    discard = False
+                finally:
+                    if pool is not None:
+                        # Rolls back what is left and keeps the connection open
+                        # unless it broke, the slot is freed either way
+                        pool.putconn(conn, discard=discard)
+                    else:
+                        conn.close()
 
     @staticmethod
     @contextmanager
-    def db_conn(file_name="db_creds.json", interface_type: PostgresInterface = None):
-        yield from ConnFactory._yield_conn(file_name, interface_type=interface_type)
+    def db_conn(
+        file_name="db_creds.json",
+        interface_type: PostgresInterface = None,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+    ):
+        yield from ConnFactory._yield_conn(
+            file_name, interface_type=interface_type, mode=mode
+        )
 
     @staticmethod
     @contextmanager
     def poktinfo_conn(
-        file_name="poktinfo_creds.json", interface_type: PostgresInterface = None
+        file_name="poktinfo_creds.json",
+        interface_type: PostgresInterface = None,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
     ):
-        yield from ConnFactory._yield_conn(file_name, interface_type=interface_type)
+        yield from ConnFactory._yield_conn(
+            file_name, interface_type=interface_type, mode=mode
+        )
 
     @staticmethod
     @contextmanager
     def latency_conn(
-        file_name="latency_creds.json", interface_type: PostgresInterface = None
+        file_name="latency_creds.json",
+        interface_type: PostgresInterface = None,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
     ):
-        yield from ConnFactory._yield_conn(file_name, interface_type=interface_type)
+        yield from ConnFactory._yield_conn(
+            file_name, interface_type=interface_type, mode=mode
+        )
 
     @staticmethod
     @contextmanager
     def errors_conn(
-        file_name="errors_creds.json", interface_type: PostgresInterface = None
+        file_name="errors_creds.json",
+        interface_type: PostgresInterface = None,
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
     ):
-        yield from ConnFactory._yield_conn(file_name, interface_type=interface_type)
+        yield from ConnFactory._yield_conn(
+            file_name, interface_type=interface_type, mode=mode
+        )
+
+    @staticmethod
+    @asynccontextmanager
+    async def _async_session(file_name: str, mode: DatabaseConnectionMode):
+        file_path = f"{ConnFactory.creds_directory}{file_name}"
+        session = ConnFactory.connect(
+            file_path=file_path,
+            interface_type=PostgresInterface.SQLALCHEMY_ASYNC,
+            mode=mode,
+        )
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    # Async versions of the context managers, they always yield an AsyncSession
+    @staticmethod
+    @asynccontextmanager
+    async def db_conn_async(
+        file_name="db_creds.json",
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+    ):
+        async with ConnFactory._async_session(file_name, mode) as session:
+            yield session
+
+    @staticmethod
+    @asynccontextmanager
+    async def poktinfo_conn_async(
+        file_name="poktinfo_creds.json",
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+    ):
+        async with ConnFactory._async_session(file_name, mode) as session:
+            yield session
+
+    @staticmethod
+    @asynccontextmanager
+    async def latency_conn_async(
+        file_name="latency_creds.json",
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+    ):
+        async with ConnFactory._async_session(file_name, mode) as session:
+            yield session
+
+    @staticmethod
+    @asynccontextmanager
+    async def errors_conn_async(
+        file_name="errors_creds.json",
+        mode: DatabaseConnectionMode = DatabaseConnectionMode.WRITE,
+    ):
+        async with ConnFactory._async_session(file_name, mode) as session:
+            yield session
 
     # Used to choose what interface to use for the connection
     @staticmethod
@@ -170,13 +632,61 @@ def execute_stmt(conn, stmt: str):
         cursor.close()
 
 
+# Statements of the helpers below, prepared by a connection the first time it
+# executes them and reused until it is closed
+PREPARED_STATEMENTS: Dict[str, str] = {
+    "delete_price_entry": """DELETE FROM public.coin_prices
+ WHERE coin = $1 AND height = $2""",
+    "insert_price_entry": """INSERT INTO public.coin_prices
+ (coin, vs_currency, price, height) VALUES ($1, $2, $3, $4)""",
+    "select_latency": """SELECT * FROM public.cherry_picker_session_region
+ WHERE session_height > $1 AND session_height <= $2""",
+    "select_latency_cache": """SELECT * FROM public.latency_cache
+ WHERE start_height >= $1 AND end_height <= $2 AND address = ANY($3)""",
+}
+# psycopg2 connection -> names of the statements it prepared
+PREPARED = weakref.WeakKeyDictionary()
+PREPARED_LOCK = threading.Lock()
+
+
+def _dbapi_conn(conn):
+    """
+    Returns the psycopg2 connection of conn, a psycopg2 connection or a
+    SQLAlchemy session whose transaction the statements then join
+    """
+    if isinstance(conn, Session):
+        return conn.connection().connection.dbapi_connection
+    return conn
+
+
+def execute_prepared(conn, name: str, params: tuple, fetch: bool = False):
+    """
+    Executes the statement name of PREPARED_STATEMENTS with params bound to
+    its $n parameters, preparing it first if conn didn't yet
+    :param conn: psycopg2 connection or SQLAlchemy session
+    :param fetch: return the rows instead of whether it succeeded
+    """
+    conn = _dbapi_conn(conn)
+    with PREPARED_LOCK:
+        prepared = PREPARED.setdefault(conn, set())
+    cursor = conn.cursor()
+    try:
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+            prepared.add(name)
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+        return cursor.fetchall() if fetch else True
+    except Exception as e:
+        print(e)
+        return [] if fetch else False
+    finally:
+        cursor.close()
+
+
 def add_price_entry(conn, coin, currency, price, height):
-    delete_stmt = f"""DELETE FROM public.coin_prices WHERE
- coin = '{coin}' AND height = {height}"""
-    execute_stmt(conn, delete_stmt)
-    insert_stmt = f"""INSERT INTO public.coin_prices(coin, vs_currency, price, height)
- VALUES ('{coin}', '{currency}', {price}, {height})"""
-    return execute_stmt(conn, insert_stmt)
+    execute_prepared(conn, "delete_price_entry", (coin, height))
+    return execute_prepared(conn, "insert_price_entry", (coin, currency, price, height))
 
 
 def fetch_all(conn, select_stmt: str):
@@ -206,19 +716,19 @@ def fetch_all_raw(conn, select_stmt: str):
 
 
 def get_latency_dict(conn, from_height: int, to_height: int):
-    select_stmt = f"""SELECT * FROM public.cherry_picker_session_region
- WHERE session_height > {from_height} AND session_height <= {to_height}"""
-    return fetch_all_raw(conn, select_stmt)
+    return execute_prepared(
+        conn, "select_latency", (from_height, to_height), fetch=True
+    )
 
 
 def get_latency_cache_dict(
     conn, from_height: int, to_height: int, addresses: List[str]
 ):
     if len(addresses):
-        addresses_stmt = (
-            f"IN {tuple(addresses)}" if len(addresses) > 1 else f"= '{addresses[0]}'"
+        # Bound as one text[] parameter whatever the number of addresses
+        return execute_prepared(
+            conn,
+            "select_latency_cache",
+            (from_height, to_height, list(addresses)),
+            fetch=True,
         )
-        select_stmt = f"""SELECT * FROM public.latency_cache
-     WHERE start_height >= {from_height} AND end_height <= {to_height}
-     AND address {addresses_stmt}"""
-        return fetch_all_raw(conn, select_stmt)
@@ -0,0 +1,160 @@
+"""
+Hedged requests, a duplicate query to another node when the first is slow
+"""
+import contextvars
+import threading
+import typing
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from common.node_pool import NodePool
+
+# Single object queries, paginated ones are too heavy to duplicate by default
+DEFAULT_ENDPOINTS = frozenset(
+    {"block/", "node/", "supply/", "param/", "allparams/", "balance/", "height/"}
+)
+
+
+class HedgePolicy:
+    """
+    Sends a query to a node and, if it hasn't answered after a delay, sends
+    the same query to a different node. The first ok response wins.
+
+    The delay defaults to a quantile of the latencies of the node pool. Extra
+    load is capped with a token bucket: every query earns budget tokens and
+    every hedge spends one, so at most about budget * queries hedges are sent.
+    A request that lost can't be aborted mid flight with requests, its
+    response is discarded when it arrives.
+
+    The first request is sent right away from a thread of its own, so the
+    delay counts from when it was sent. Hedges go through a bounded executor
+    and only acquire their node once they start.
+    """
+
+    def __init__(
+        self,
+        delay: typing.Optional[float] = None,
+        quantile: float = 0.95,
+        min_delay: float = 0.01,
+        budget: float = 0.05,
+        max_tokens: float = 10,
+        endpoints: typing.Iterable[str] = DEFAULT_ENDPOINTS,
+        workers: int = 32,
+    ):
+        """
+        :param delay: seconds before hedging, a latency quantile if None
+        :param quantile: latency quantile of the pool used as delay
+        :param min_delay: lower bound of the delay
+        :param budget: max ratio of hedges to queries
+        :param max_tokens: max hedges that can be sent in a burst
+        :param endpoints: rpc endpoints that are hedged
+        :param workers: max number of hedges in flight
+        """
+        self.delay = delay
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.endpoints = frozenset(endpoints)
+        self.tokens = max_tokens
+        self.queries = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="hedge"
+        )
+
+    def applies(self, endpoint: str) -> bool:
+        return endpoint in self.endpoints
+
+    def get_delay(self, pool: NodePool) -> typing.Optional[float]:
+        """
+        :return: seconds before hedging, None not to hedge
+        """
+        if self.delay is not None:
+            return self.delay
+        delay = pool.latency_quantile(self.quantile)
+        # No samples yet, don't hedge blind
+        if delay is None:
+            return None
+        return max(delay, self.min_delay)
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+
+    def run(
+        self,
+        send: typing.Callable[[str], tuple],
+        pool: NodePool,
+        exclude: typing.Container[str] = frozenset(),
+    ) -> tuple:
+        """
+        Runs a query with hedging
+        :param send: sends the query to an acquired node and releases it,
+            returns a tuple whose second item tells if the response is ok.
+            It runs in the context of the caller.
+        :param pool: pool the nodes are acquired from
+        :param exclude: urls not to send the query to unless there is no other
+        :return: the result of send of the first ok response, or of the
+            last response if none is ok
+        """
+        with self._lock:
+            self.queries += 1
+            self.tokens = min(self.tokens + self.budget, self.max_tokens)
+
+        primary = pool.acquire(exclude=exclude)
+        futures = {_start_thread(contextvars.copy_context().run, send, primary)}
+        done, _ = wait(futures, timeout=self.get_delay(pool))
+        if not done and self._take_token():
+
+            def send_hedge():
+                # Acquired here so that a hedge cancelled while queued holds
+                # no node
+                return send(pool.acquire(exclude={primary, *exclude}))
+
+            futures.add(
+                self._executor.submit(contextvars.copy_context().run, send_hedge)
+            )
+
+        result, error = None, None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if result[1]:
+                    for pending in futures:
+                        pending.cancel()
+                    return result
+        if result is not None:
+            return result
+        raise error
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_thread(fn: typing.Callable, *args) -> Future:
+    """
+    Runs fn(*args) in a new daemon thread
+    :return: future of its result
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
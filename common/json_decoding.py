@@ -0,0 +1,74 @@
+"""
+Json decoding of rpc responses, with faster or leaner backends when installed.
+
+orjson is used to decode whole responses if available. ijson is used to
+decode the pages of paginated responses straight from the socket, so neither
+the raw body nor the decoded text of a 50k items page is ever held in memory.
+"""
+import io
+import json
+import typing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Raised on malformed or truncated content by the available backends
+DECODE_ERRORS: typing.Tuple[typing.Type[Exception], ...] = (json.JSONDecodeError,)
+if orjson is not None:
+    DECODE_ERRORS += (orjson.JSONDecodeError,)
+if ijson is not None:
+    DECODE_ERRORS += (ijson.JSONError,)
+
+
+def loads(content: typing.Union[bytes, str]):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def can_stream() -> bool:
+    return ijson is not None
+
+
+def decode_page(
+    source: typing.Union[bytes, typing.BinaryIO],
+    result_key: str,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+) -> dict:
+    """
+    Decodes a page of a paginated response.
+
+    Without fields the whole body is read and decoded at once with orjson if
+    installed, the fastest by far but the raw body and the decoded page are
+    held together. Otherwise the page is decoded from source with the C
+    backend of ijson, about twice the cpu time of orjson but the raw body is
+    never held, and the fields that aren't kept are dropped once decoded.
+    :param source: body of the response or a file like object to stream it from
+    :param result_key: key of the result array, eg "result" or "txs"
+    :param fields: keys of the result items to keep, all if None
+    :return: dict, the top level scalars of the page and the result array
+    """
+    if ijson is None or (fields is None and orjson is not None):
+        if not isinstance(source, (bytes, str)):
+            source = source.read()
+        page = loads(source)
+    else:
+        if isinstance(source, (bytes, str)):
+            source = io.BytesIO(
+                source if isinstance(source, bytes) else source.encode()
+            )
+        # Every top level value is built by the backend, not event by event
+        page = dict(ijson.kvitems(source, "", use_float=True))
+    items = page.get(result_key)
+    if fields is not None and items is not None:
+        fields = frozenset(fields)
+        for i, item in enumerate(items):
+            items[i] = {key: value for key, value in item.items() if key in fields}
+    return page
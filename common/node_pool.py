@@ -0,0 +1,275 @@
+"""
+Latency aware selection of the node each rpc query is sent to
+"""
+import collections
+import random
+import threading
+import time
+import typing
+
+
+class NodeStats:
+    """
+    What the pool knows about one node
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        # Exponentially weighted moving averages, None until the first response
+        self.latency: typing.Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.lag = 0
+        self.height = 0
+        self.consecutive_failures = 0
+        # Set while the circuit is open, the node isn't picked until then
+        self.ejected_until: typing.Optional[float] = None
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until is not None and now < self.ejected_until
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "in_flight": self.in_flight,
+            "lag": self.lag,
+            "height": self.height,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": self.is_ejected(time.monotonic()),
+        }
+
+
+class NodePool:
+    """
+    Picks the node of every query from the nodes that aren't ejected and
+    aren't lagging, using the power of two random choices on a score of
+    outstanding requests and latency.
+
+    A node that fails failure_threshold times in a row is ejected for
+    cooldown seconds (circuit breaker). Once the cooldown passes it gets a
+    trial query, or a probe from the background health probe if running,
+    and goes back into rotation on success or is ejected again on failure.
+    """
+
+    LEAST_OUTSTANDING = "least_outstanding"
+    WEIGHTED_LATENCY = "weighted_latency"
+
+    def __init__(
+        self,
+        urls: typing.Iterable[str] = (),
+        strategy: str = WEIGHTED_LATENCY,
+        alpha: float = 0.2,
+        failure_threshold: int = 5,
+        cooldown: float = 30,
+        max_lag: int = 3,
+        latency_window: int = 1000,
+    ):
+        """
+        :param urls: base urls of the nodes
+        :param strategy: LEAST_OUTSTANDING or WEIGHTED_LATENCY
+        :param alpha: weight of the last sample in the moving averages
+        :param failure_threshold: failures in a row that eject a node
+        :param cooldown: seconds a node stays ejected
+        :param max_lag: blocks a node can be behind before it is avoided
+        :param latency_window: number of latest latencies quantiles are taken of
+        """
+        self.strategy = strategy
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_lag = max_lag
+        self._nodes: typing.Dict[str, NodeStats] = {}
+        self._urls: typing.List[str] = []
+        self._lock = threading.Lock()
+        # Latencies of the last ok responses of all nodes
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._quantiles: typing.Dict[float, typing.Tuple[int, float]] = {}
+        self._samples = 0
+        self._probe_thread: typing.Optional[threading.Thread] = None
+        self._stop_probe = threading.Event()
+        self.set_urls(urls)
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def urls(self) -> typing.List[str]:
+        return self._urls
+
+    def set_urls(self, urls: typing.Iterable[str]):
+        """
+        Replaces the nodes of the pool, keeping the stats of retained nodes
+        """
+        urls = list(dict.fromkeys(urls))
+        with self._lock:
+            self._nodes = {
+                url: self._nodes[url] if url in self._nodes else NodeStats(url)
+                for url in urls
+            }
+            self._urls = urls
+
+    def _score(
+        self, node: NodeStats, default_latency: float
+    ) -> typing.Tuple[float, ...]:
+        latency = node.latency if node.latency is not None else default_latency
+        if self.strategy == NodePool.LEAST_OUTSTANDING:
+            return node.in_flight, latency
+        weighted_latency = (
+            latency * (node.in_flight + 1) / max(1 - node.error_rate, 0.05)
+        )
+        return weighted_latency, node.in_flight
+
+    def pick(self, exclude: typing.Container[str] = ()) -> str:
+        """
+        Picks a node without counting a request on it
+        :param exclude: urls not to pick unless there is no other node
+        :return: base url of the node
+        """
+        with self._lock:
+            return self._pick(exclude).url
+
+    def acquire(self, exclude: typing.Container[str] = ()) -> str:
+        """
+        Picks a node and counts a request in flight on it, every acquire has
+        to be followed by a release
+        :param exclude: urls not to pick unless there is no other node
+        :return: base url of the node
+        """
+        with self._lock:
+            node = self._pick(exclude)
+            node.in_flight += 1
+            return node.url
+
+    def _pick(self, exclude: typing.Container[str]) -> NodeStats:
+        if not len(self._nodes):
+            raise ValueError("Node pool is empty, set valid urls first")
+        now = time.monotonic()
+        nodes = [
+            node for node in self._nodes.values() if node.url not in exclude
+        ] or list(self._nodes.values())
+        available = [node for node in nodes if not node.is_ejected(now)]
+        # Fail open if every node is ejected rather than failing every query
+        candidates = (
+            [node for node in available if node.lag <= self.max_lag]
+            or available
+            or nodes
+        )
+        candidates = random.sample(candidates, min(len(candidates), 2))
+        # Nodes without a response yet are scored as an average node
+        latencies = [node.latency for node in nodes if node.latency is not None]
+        default_latency = sum(latencies) / len(latencies) if len(latencies) else 0.0
+        return min(candidates, key=lambda node: self._score(node, default_latency))
+
+    def release(self, url: str, latency: float, ok: bool):
+        """
+        Records the outcome of a request acquired on url
+        :param url: base url of the node
+        :param latency: seconds the request took
+        :param ok: whether the request succeeded
+        """
+        with self._lock:
+            node = self._nodes.get(url)
+            if node is None:
+                return
+            node.in_flight = max(node.in_flight - 1, 0)
+            self._record(node, latency, ok)
+            if ok:
+                self._latencies.append(latency)
+                self._samples += 1
+
+    def latency_quantile(self, quantile: float) -> typing.Optional[float]:
+        """
+        Returns the quantile of the latest latencies of all nodes, None if
+        there are no samples yet. Recomputed at most every 50 samples.
+        :param quantile: between 0 and 1, eg 0.95
+        """
+        with self._lock:
+            samples, value = self._quantiles.get(quantile, (-1, None))
+            if not len(self._latencies):
+                return None
+            if self._samples - samples >= 50 or samples < 0:
+                latencies = sorted(self._latencies)
+                value = latencies[
+                    min(int(quantile * len(latencies)), len(latencies) - 1)
+                ]
+                self._quantiles[quantile] = (self._samples, value)
+            return value
+
+    def _record(self, node: NodeStats, latency: typing.Optional[float], ok: bool):
+        node.error_rate += self.alpha * ((0.0 if ok else 1.0) - node.error_rate)
+        if ok:
+            node.latency = (
+                latency
+                if node.latency is None
+                else node.latency + self.alpha * (latency - node.latency)
+            )
+            node.consecutive_failures = 0
+            node.ejected_until = None
+        else:
+            node.consecutive_failures += 1
+            if node.consecutive_failures >= self.failure_threshold:
+                node.ejected_until = time.monotonic() + self.cooldown
+
+    def record_height(self, url: str, height: int):
+        """
+        Records the height a node is at, lags are relative to the highest node
+        """
+        self.record_heights({url: height})
+
+    def record_heights(self, heights: typing.Mapping[str, int]):
+        with self._lock:
+            for url, height in heights.items():
+                if url in self._nodes:
+                    self._nodes[url].height = height
+            best_height = max((node.height for node in self._nodes.values()), default=0)
+            for node in self._nodes.values():
+                node.lag = best_height - node.height if node.height else 0
+
+    def stats(self) -> typing.List[dict]:
+        with self._lock:
+            return [node.to_dict() for node in self._nodes.values()]
+
+    def start_health_probe(
+        self, probe: typing.Callable[[str], int], interval: float = 10
+    ):
+        """
+        Starts a daemon thread that probes the ejected nodes whose cooldown
+        passed every interval seconds and brings them back if they answer
+        :param probe: returns the height of the node at a base url or raises
+        :param interval: seconds between two rounds of probes
+        """
+        self.stop_health_probe()
+        self._stop_probe.clear()
+        self._probe_thread = threading.Thread(
+            target=self._probe_loop, args=(probe, interval), daemon=True
+        )
+        self._probe_thread.start()
+
+    def stop_health_probe(self):
+        if self._probe_thread is not None:
+            self._stop_probe.set()
+            self._probe_thread.join()
+            self._probe_thread = None
+
+    def _probe_loop(self, probe: typing.Callable[[str], int], interval: float):
+        while not self._stop_probe.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                nodes = [
+                    node
+                    for node in self._nodes.values()
+                    if node.ejected_until is not None and now >= node.ejected_until
+                ]
+            for node in nodes:
+                start = time.perf_counter()
+                try:
+                    height = probe(node.url)
+                except Exception:
+                    with self._lock:
+                        self._record(node, None, False)
+                    continue
+                with self._lock:
+                    self._record(node, time.perf_counter() - start, True)
+                self.record_height(node.url, height)
@@ -0,0 +1,110 @@
+"""
+Background probing of the height of candidate nodes
+"""
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+
+class NodeProber:
+    """
+    Probes the height of every candidate node concurrently and hands the
+    nodes within max_lag blocks of the tip to on_update in one go, optionally
+    again every interval seconds from a daemon thread.
+    """
+
+    def __init__(
+        self,
+        urls: typing.Iterable[str],
+        fetch_height: typing.Callable[[str], int],
+        fetch_tip: typing.Callable[[], int],
+        on_update: typing.Callable[[typing.List[str]], None],
+        max_lag: int = 3,
+        workers: int = 64,
+    ):
+        """
+        :param urls: base urls of the candidate nodes
+        :param fetch_height: returns the height of the node at a base url or
+            raises, should have a tight timeout
+        :param fetch_tip: returns the reference height of the chain
+        :param on_update: receives the healthy urls after every probe that
+            found some
+        :param max_lag: blocks a node can be behind the tip to be healthy
+        :param workers: max number of probes in flight
+        """
+        self.urls = list(dict.fromkeys(urls))
+        self.fetch_height = fetch_height
+        self.fetch_tip = fetch_tip
+        self.on_update = on_update
+        self.max_lag = max_lag
+        self.workers = workers
+        # Height and lag of every candidate of the last probe, None if it failed
+        self.heights: typing.Dict[str, typing.Optional[int]] = {}
+        self.lags: typing.Dict[str, typing.Optional[int]] = {}
+        self._thread: typing.Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _fetch_height(self, url: str) -> typing.Optional[int]:
+        try:
+            return self.fetch_height(url)
+        except Exception:
+            return None
+
+    def probe(self) -> typing.List[str]:
+        """
+        Probes all candidates once and updates the healthy nodes, unless none
+        of them is healthy
+        :return: the healthy urls
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            heights = dict(zip(self.urls, executor.map(self._fetch_height, self.urls)))
+        known_heights = [height for height in heights.values() if height is not None]
+        try:
+            tip = self.fetch_tip()
+        except Exception:
+            # Reference node is down, compare to the best candidate instead
+            tip = max(known_heights, default=0)
+        lags = {
+            url: tip - height if height is not None else None
+            for url, height in heights.items()
+        }
+        healthy = [
+            url
+            for url, lag in lags.items()
+            if lag is not None and 0 <= lag < self.max_lag
+        ]
+        self.heights, self.lags = heights, lags
+        if not len(healthy):
+            # Most likely a failure of the probes themselves, keeping the
+            # current nodes is better than leaving none to query
+            print(
+                f"No healthy node out of {len(self.urls)} candidates, "
+                "keeping the current ones"
+            )
+            return healthy
+        self.on_update(healthy)
+        return healthy
+
+    def start(self, interval: float = 60):
+        """
+        Probes every interval seconds from a daemon thread
+        """
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(e)
+            if self._stop.wait(interval):
+                return
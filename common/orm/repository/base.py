@@ -8,6 +8,7 @@ import typing
 from sqlalchemy.orm import Session
 
 from ..schema import Base
+from ...db_utils import DatabaseConnectionMode  # noqa: F401
 
 
 class TransactionTypes(enum.IntEnum):
@@ -16,11 +17,6 @@ class TransactionTypes(enum.IntEnum):
     FLUSH = 2
 
 
-class DatabaseConnectionMode(enum.IntEnum):
-    WRITE = 0
-    READ = 1
-
-
 class AbstractRepository(abc.ABC):
     @staticmethod
     def save(
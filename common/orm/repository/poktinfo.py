@@ -3,6 +3,7 @@ import typing
 
 from sqlalchemy import and_, func, or_, true
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .base import AbstractRepository
@@ -19,6 +20,7 @@ from ..schema import (
     CacheSetStateRangeEntry,
     LocationInfo,
 )
+from ... import aio_utils
 from ...utils import get_param
 
 
@@ -242,11 +244,29 @@ class PoktInfoRepository(AbstractRepository):
         to_height: int,
         addresses: typing.List[str],
         chain: str = None,
+    ) -> float:
+        servicer_stake_weight_multiplier = float(
+            get_param(to_height, "pos/ServicerStakeWeightMultiplier")
+        )
+        return PoktInfoRepository._get_rewards_total_per15k(
+            session,
+            from_height,
+            to_height,
+            addresses,
+            servicer_stake_weight_multiplier,
+            chain,
+        )
+
+    @staticmethod
+    def _get_rewards_total_per15k(
+        session: Session,
+        from_height: int,
+        to_height: int,
+        addresses: typing.List[str],
+        servicer_stake_weight_multiplier: float,
+        chain: str = None,
     ) -> float:
         try:
-            servicer_stake_weight_multiplier = float(
-                get_param(to_height, "pos/ServicerStakeWeightMultiplier")
-            )
             min_weight = 1 / servicer_stake_weight_multiplier
             query = session.query(
                 func.sum(RewardsInfo.rewards / RewardsInfo.stake_weight * min_weight)
@@ -612,3 +632,95 @@ class PoktInfoRepository(AbstractRepository):
             return True
         except Exception:
             return False
+
+
+def _run_sync(query: typing.Callable) -> typing.Callable:
+    async def run(session: AsyncSession, *args, **kwargs):
+        return await session.run_sync(query, *args, **kwargs)
+
+    run.__name__ = query.__name__
+    run.__doc__ = query.__doc__
+    return staticmethod(run)
+
+
+class AsyncPoktInfoRepository:
+    """
+    The read queries of PoktInfoRepository taking an AsyncSession, eg from
+    ConnFactory.poktinfo_conn_async(). Every query runs the sync one with
+    AsyncSession.run_sync so relationships of the returned rows must not be
+    lazy loaded outside of it.
+    """
+
+    get_cache_sets = _run_sync(PoktInfoRepository.get_cache_sets)
+    get_cache_set_by_user_id_set_name = _run_sync(
+        PoktInfoRepository.get_cache_set_by_user_id_set_name
+    )
+    get_cache_sets_by_id = _run_sync(PoktInfoRepository.get_cache_sets_by_id)
+    get_cache_set_nodes_by_id = _run_sync(PoktInfoRepository.get_cache_set_nodes_by_id)
+    get_cache_set_addresses = _run_sync(PoktInfoRepository.get_cache_set_addresses)
+    get_addresses_by_domain = _run_sync(PoktInfoRepository.get_addresses_by_domain)
+    get_last_recorded_service_height = _run_sync(
+        PoktInfoRepository.get_last_recorded_service_height
+    )
+    get_last_recorded_reward_height = _run_sync(
+        PoktInfoRepository.get_last_recorded_reward_height
+    )
+    get_last_recorded_node_height = _run_sync(
+        PoktInfoRepository.get_last_recorded_node_height
+    )
+    get_last_recorded_errors_height = _run_sync(
+        PoktInfoRepository.get_last_recorded_errors_height
+    )
+    get_last_recorded_latency_height = _run_sync(
+        PoktInfoRepository.get_last_recorded_latency_height
+    )
+    get_failed_blocks_of_service = _run_sync(
+        PoktInfoRepository.get_failed_blocks_of_service
+    )
+    get_failed_ranges_of_service = _run_sync(
+        PoktInfoRepository.get_failed_ranges_of_service
+    )
+    get_failed_ranges_of_cache_set_service = _run_sync(
+        PoktInfoRepository.get_failed_ranges_of_cache_set_service
+    )
+    get_all_active_nodes = _run_sync(PoktInfoRepository.get_all_active_nodes)
+    get_open_locations = _run_sync(PoktInfoRepository.get_open_locations)
+    get_rewards_total = _run_sync(PoktInfoRepository.get_rewards_total)
+    get_relays_total = _run_sync(PoktInfoRepository.get_relays_total)
+    get_latency_cache = _run_sync(PoktInfoRepository.get_latency_cache)
+    get_rewards_info = _run_sync(PoktInfoRepository.get_rewards_info)
+    get_locations_dict = _run_sync(PoktInfoRepository.get_locations_dict)
+    get_node_count = _run_sync(PoktInfoRepository.get_node_count)
+    get_errors_dict = _run_sync(PoktInfoRepository.get_errors_dict)
+    has_url_changed = _run_sync(PoktInfoRepository.has_url_changed)
+    has_chain_changed = _run_sync(PoktInfoRepository.has_chain_changed)
+    has_location_changed = _run_sync(PoktInfoRepository.has_location_changed)
+    is_node_recorded = _run_sync(PoktInfoRepository.is_node_recorded)
+    is_height_recorded = _run_sync(PoktInfoRepository.is_height_recorded)
+    is_height_range_recorded = _run_sync(PoktInfoRepository.is_height_range_recorded)
+    is_cache_set_height_range_recorded = _run_sync(
+        PoktInfoRepository.is_cache_set_height_range_recorded
+    )
+    is_location_recorded = _run_sync(PoktInfoRepository.is_location_recorded)
+    does_height_exist = _run_sync(PoktInfoRepository.does_height_exist)
+
+    @staticmethod
+    async def get_rewards_total_per15k(
+        session: AsyncSession,
+        from_height: int,
+        to_height: int,
+        addresses: typing.List[str],
+        chain: str = None,
+    ) -> float:
+        # The param is awaited before run_sync so the loop isn't blocked on it
+        servicer_stake_weight_multiplier = float(
+            await aio_utils.get_param(to_height, "pos/ServicerStakeWeightMultiplier")
+        )
+        return await session.run_sync(
+            PoktInfoRepository._get_rewards_total_per15k,
+            from_height,
+            to_height,
+            addresses,
+            servicer_stake_weight_multiplier,
+            chain,
+        )
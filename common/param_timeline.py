@@ -0,0 +1,165 @@
+"""
+Height interval cache of the governance params of the chain
+"""
+import bisect
+import threading
+import time
+import typing
+
+
+def flatten_params(all_params: dict) -> typing.Dict[str, typing.Tuple[str, str]]:
+    """
+    Flattens an allparams response
+    :return: dict, param key -> (section of the response, param value)
+    """
+    params = {}
+    for section, entries in all_params.items():
+        if not isinstance(entries, list):
+            continue
+        for entry in entries:
+            params[entry["param_key"]] = (section, entry["param_value"])
+    return params
+
+
+class ParamTimeline:
+    """
+    Keeps every param key as a sorted list of the heights its value changed at,
+    so the value at any height in [from_height, to_height] is one bisect away.
+
+    The timeline is built from allparams snapshots only: two snapshots that
+    are equal are assumed to have no change in between, otherwise the range is
+    bisected until the exact height of every change is found. Params change
+    only on governance txs so building or extending the timeline over a long
+    range costs about log2(range) snapshots per change.
+    """
+
+    def __init__(
+        self,
+        fetch_params: typing.Callable[[int], dict],
+        fetch_tip: typing.Callable[[], int],
+        refresh_interval: float = 60,
+    ):
+        """
+        :param fetch_params: returns the allparams response at a height
+        :param fetch_tip: returns the height of the last block
+        :param refresh_interval: min seconds between two refreshes from the tip
+        """
+        self.fetch_params = fetch_params
+        self.fetch_tip = fetch_tip
+        self.refresh_interval = refresh_interval
+        self.from_height: typing.Optional[int] = None
+        self.to_height: typing.Optional[int] = None
+        self._sections: typing.Dict[str, str] = {}
+        self._heights: typing.Dict[str, typing.List[int]] = {}
+        self._values: typing.Dict[str, typing.List[str]] = {}
+        self._last_snapshot: typing.Dict[str, typing.Tuple[str, str]] = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def build(self, from_height: int, to_height: typing.Optional[int] = None):
+        """
+        Builds the timeline from from_height up to to_height or the tip
+        """
+        with self._lock:
+            if to_height is None:
+                to_height = self.fetch_tip()
+            snapshot = flatten_params(self.fetch_params(from_height))
+            self._sections, self._heights, self._values = {}, {}, {}
+            for key, (section, value) in snapshot.items():
+                self._sections[key] = section
+                self._heights[key] = [from_height]
+                self._values[key] = [value]
+            self.from_height = self.to_height = from_height
+            self._last_snapshot = snapshot
+            self._extend(to_height)
+            self._last_refresh = time.monotonic()
+
+    def refresh(self):
+        """
+        Extends the timeline incrementally up to the current tip
+        """
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            tip = self.fetch_tip()
+            if tip > self.to_height:
+                self._extend(tip)
+
+    def _extend(self, to_height: int):
+        if to_height <= self.to_height:
+            return
+        snapshot = flatten_params(self.fetch_params(to_height))
+        self._find_changes(self.to_height, self._last_snapshot, to_height, snapshot)
+        self.to_height, self._last_snapshot = to_height, snapshot
+
+    def _find_changes(self, low: int, low_snapshot: dict, high: int, high_snapshot):
+        if low_snapshot == high_snapshot:
+            return
+        if high - low == 1:
+            for key, (section, value) in high_snapshot.items():
+                if key not in self._heights:
+                    self._sections[key] = section
+                    self._heights[key], self._values[key] = [], []
+                if low_snapshot.get(key, (section, None))[1] != value:
+                    # Values first so concurrent lookups never see a height
+                    # without its value
+                    self._values[key].append(value)
+                    self._heights[key].append(high)
+            return
+        mid = (low + high) // 2
+        mid_snapshot = flatten_params(self.fetch_params(mid))
+        self._find_changes(low, low_snapshot, mid, mid_snapshot)
+        self._find_changes(mid, mid_snapshot, high, high_snapshot)
+
+    def covers(self, height: int, key: typing.Optional[str] = None) -> bool:
+        """
+        Whether the value of key (or of all params) at height can be answered
+        without a network call, refreshes from the tip first if height is past
+        the timeline
+        """
+        if self.to_height is None:
+            return False
+        if (
+            height > self.to_height
+            and time.monotonic() - self._last_refresh > self.refresh_interval
+        ):
+            self.refresh()
+        if not self.from_height <= height <= self.to_height:
+            return False
+        if key is None:
+            return True
+        heights = self._heights.get(key)
+        return bool(heights) and heights[0] <= height
+
+    def get(self, key: str, height: int) -> str:
+        """
+        Returns the value of key at height
+        :raises KeyError: if the value isn't covered by the timeline
+        """
+        if not self.covers(height, key):
+            raise KeyError(f'Param "{key}" at "{height}" is not in the timeline')
+        index = bisect.bisect_right(self._heights[key], height) - 1
+        return self._values[key][index]
+
+    def get_all(self, height: int) -> dict:
+        """
+        Returns the params at height in the format of the allparams response
+        :raises KeyError: if height isn't covered by the timeline
+        """
+        if not self.covers(height):
+            raise KeyError(f'Params at "{height}" are not in the timeline')
+        all_params = {}
+        for key, section in list(self._sections.items()):
+            if self.covers(height, key):
+                all_params.setdefault(section, []).append(
+                    {"param_key": key, "param_value": self.get(key, height)}
+                )
+        return all_params
+
+    def intervals(self, key: str) -> typing.List[typing.Tuple[int, int, str]]:
+        """
+        Returns the intervals of key as (start_height, end_height, value)
+        tuples, end heights are inclusive
+        """
+        heights, values = self._heights[key], self._values[key]
+        ends = [height - 1 for height in heights[1:]] + [self.to_height]
+        return list(zip(heights, ends, values))
@@ -0,0 +1,193 @@
+"""
+Thread safe pool of psycopg2 connections
+"""
+import os
+import threading
+import time
+import typing
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+
+class PooledConnection:
+    def __init__(self, conn: psycopg2.extensions.connection):
+        self.conn = conn
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+
+class PgConnectionPool:
+    """
+    Keeps between min_size and max_size psycopg2 connections open and hands
+    them out to one thread at a time, blocking when all of them are in use.
+
+    On checkout a connection is replaced if it is closed, older than
+    max_lifetime or, when it was idle for more than check_interval seconds,
+    if it doesn't answer a ping. On return a connection left in a transaction
+    is rolled back and its autocommit restored, connections that broke are
+    discarded.
+    """
+
+    def __init__(
+        self,
+        connect: typing.Callable[[], psycopg2.extensions.connection],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: typing.Optional[float] = 3600,
+        check_interval: float = 30,
+        timeout: typing.Optional[float] = 30,
+    ):
+        """
+        :param connect: opens a new connection
+        :param min_size: connections opened by prewarm
+        :param max_size: max connections open at once
+        :param max_lifetime: seconds after which a connection is replaced
+        :param check_interval: idle seconds after which a connection is pinged
+        :param timeout: max seconds to wait for a connection, forever if None
+        """
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.timeout = timeout
+        # Idle connections, the last returned is handed out first
+        self._idle: typing.List[PooledConnection] = []
+        self._used: typing.Dict[int, PooledConnection] = {}
+        self._size = 0
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _open(self) -> PooledConnection:
+        conn = self.connect()
+        conn.autocommit = True
+        return PooledConnection(conn)
+
+    def _is_healthy(self, pooled: PooledConnection) -> bool:
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime is not None and now - pooled.created > self.max_lifetime:
+            return False
+        if now - pooled.last_used > self.check_interval:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _check_fork(self):
+        # Connections of the parent can't be used nor closed by a child
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle, self._used, self._size = [], {}, 0
+
+    def getconn(self) -> psycopg2.extensions.connection:
+        """
+        Checks out a healthy connection, every getconn has to be followed by
+        a putconn
+        :raises psycopg2.pool.PoolError: if none is available before timeout
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._condition:
+            self._check_fork()
+            while not self._idle and self._size >= self.max_size:
+                remaining = (
+                    deadline - time.monotonic() if deadline is not None else None
+                )
+                if remaining is not None and remaining <= 0:
+                    raise psycopg2.pool.PoolError(
+                        f"No connection available after {self.timeout}s"
+                    )
+                self._condition.wait(remaining)
+            pooled = self._idle.pop() if self._idle else None
+            self._size += pooled is None
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                _close(pooled.conn)
+                pooled = None
+            if pooled is None:
+                pooled = self._open()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._used[id(pooled.conn)] = pooled
+        return pooled.conn
+
+    def putconn(self, conn: psycopg2.extensions.connection, discard: bool = False):
+        """
+        Returns a connection checked out with getconn
+        :param discard: close the connection instead of keeping it
+        """
+        with self._condition:
+            pooled = self._used.pop(id(conn), None)
+        if pooled is None:
+            # Checked out before a fork or a dispose
+            return
+        if not discard and not conn.closed:
+            try:
+                if (
+                    conn.get_transaction_status()
+                    != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                ):
+                    conn.rollback()
+                conn.autocommit = True
+            except psycopg2.Error:
+                discard = True
+        discard = discard or bool(conn.closed)
+        if discard:
+            _close(conn)
+        pooled.last_used = time.monotonic()
+        with self._condition:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    def prewarm(self, connections: typing.Optional[int] = None):
+        """
+        Opens connections up to min_size, or connections if set
+        """
+        conns = [
+            self.getconn()
+            for _ in range(max((connections or self.min_size) - self._size, 0))
+        ]
+        for conn in conns:
+            self.putconn(conn)
+
+    def dispose(self, close: bool = True):
+        """
+        Drops the idle connections, new ones are opened on the next getconn
+        :param close: close the idle connections, False in a forked child
+        """
+        if not close:
+            # The lock may have been held by a thread of the parent
+            self._condition = threading.Condition()
+            self._pid = os.getpid()
+            self._idle, self._used, self._size = [], {}, 0
+            return
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            _close(pooled.conn)
+
+
+def _close(conn: psycopg2.extensions.connection):
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
@@ -7,7 +7,7 @@ import pycoingecko
 from common.db_utils import ConnFactory, add_price_entry
 from common.orm.repository import PoktInfoRepository
 from common.orm.schema import CoinPrices
-from common.utils import get_block_height_at_timestamp
+from common.utils import get_heights_at_timestamps
 
 cg = pycoingecko.CoinGeckoAPI()
 
@@ -61,11 +61,13 @@ def record_historical_pocket_prices(
     coin: str, currency: str, from_date: str, to_date: str
 ) -> None:
     prices_dict = get_historical_prices(COINS_MAP[coin], currency, from_date, to_date)
+    heights = get_heights_at_timestamps(
+        pd.Timestamp(date, tz="UTC") for date in prices_dict
+    )
 
     with ConnFactory.poktinfo_conn() as conn:
-        for date in prices_dict:
+        for date, height in zip(prices_dict, heights):
             price = prices_dict[date]
-            height = get_block_height_at_timestamp(pd.Timestamp(date, tz="UTC"))
             has_added = add_price_entry(conn, coin, currency, price, height)
             if not has_added:
                 print(f"Failed adding price entry for {coin} at {date}")
@@ -0,0 +1,183 @@
+"""
+Retries of rpc queries with backoff, node rotation and per endpoint budgets
+"""
+import asyncio
+import contextvars
+import threading
+import typing
+
+import aiohttp
+import requests
+import urllib3
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    Retrying,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from common.json_decoding import DECODE_ERRORS
+from common.rpc_client import RpcResultError, RpcStatusError
+
+# Errors of a node or of the network, anything else is a bad query or a bug
+RETRYABLE_ERRORS: typing.Tuple[typing.Type[BaseException], ...] = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    # Raised as is while streaming a page from the raw urllib3 response
+    urllib3.exceptions.ProtocolError,
+    urllib3.exceptions.ReadTimeoutError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    RpcStatusError,
+    RpcResultError,
+) + DECODE_ERRORS
+
+# Set of the nodes already tried by the call in progress in this thread or task
+_tried_nodes = contextvars.ContextVar("tried_nodes", default=None)
+
+
+def get_tried_nodes() -> typing.FrozenSet[str]:
+    """
+    Returns the nodes the call in progress was already sent to, to be
+    excluded when acquiring the node of the next attempt
+    """
+    nodes = _tried_nodes.get()
+    return frozenset(nodes) if nodes is not None else frozenset()
+
+
+def record_tried_node(node: str):
+    """
+    Records the node an attempt of the call in progress is sent to
+    """
+    nodes = _tried_nodes.get()
+    if nodes is not None:
+        nodes.add(node)
+
+
+class RetryPolicy:
+    """
+    Retries a call on RETRYABLE_ERRORS only, waiting a random exponential
+    backoff between attempts, and sends every attempt to a node the call
+    wasn't sent to yet while there is one.
+
+    Retries are capped with a token bucket per endpoint: every call earns
+    budget tokens and every retry spends one, so when a node or the whole
+    network is down retries stay at about budget * calls instead of
+    multiplying the load by the number of attempts.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        base_delay: float = 0.1,
+        max_delay: float = 5,
+        budget: float = 0.2,
+        max_tokens: float = 10,
+        retryable: typing.Tuple[typing.Type[BaseException], ...] = RETRYABLE_ERRORS,
+        on_retry: typing.Optional[typing.Callable[[str, BaseException], None]] = None,
+    ):
+        """
+        :param attempts: max attempts of a call, the first one included
+        :param base_delay: seconds the backoff starts from
+        :param max_delay: max seconds of a backoff
+        :param budget: max ratio of retries to calls of an endpoint
+        :param max_tokens: max retries of an endpoint that can be sent in a burst
+        :param retryable: exception types that are retried
+        :param on_retry: called with the endpoint and the error of every retry
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.retryable = retryable
+        self.on_retry = on_retry
+        self.tokens: typing.Dict[str, float] = {}
+        self.calls: typing.Dict[str, int] = {}
+        self.retries: typing.Dict[str, int] = {}
+        # Retries denied because the budget of the endpoint ran out
+        self.denied: typing.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _start_call(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.tokens[endpoint] = min(
+                self.tokens.get(endpoint, self.max_tokens) + self.budget,
+                self.max_tokens,
+            )
+
+    def _take_token(self, endpoint: str) -> bool:
+        with self._lock:
+            if self.tokens.get(endpoint, self.max_tokens) < 1:
+                self.denied[endpoint] = self.denied.get(endpoint, 0) + 1
+                return False
+            self.tokens[endpoint] = self.tokens.get(endpoint, self.max_tokens) - 1
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+            return True
+
+    def _should_retry(self, endpoint: str) -> typing.Callable[[RetryCallState], bool]:
+        def should_retry(retry_state: RetryCallState) -> bool:
+            if not retry_state.outcome.failed:
+                return False
+            if not isinstance(retry_state.outcome.exception(), self.retryable):
+                return False
+            if retry_state.attempt_number >= self.attempts:
+                return False
+            if not self._take_token(endpoint):
+                return False
+            if self.on_retry is not None:
+                self.on_retry(endpoint, retry_state.outcome.exception())
+            return True
+
+        return should_retry
+
+    def _retrying_kwargs(self, endpoint: str) -> dict:
+        return dict(
+            stop=stop_after_attempt(self.attempts),
+            wait=wait_random_exponential(
+                multiplier=self.base_delay, max=self.max_delay
+            ),
+            retry=self._should_retry(endpoint),
+            reraise=True,
+        )
+
+    def call(self, endpoint: str, fn: typing.Callable, *args, **kwargs):
+        """
+        Calls fn with retries
+        :param endpoint: rpc endpoint fn queries, the budget it spends from
+        :raises: the exception of the last attempt
+        """
+        self._start_call(endpoint)
+        token = _tried_nodes.set(set())
+        try:
+            return Retrying(**self._retrying_kwargs(endpoint))(fn, *args, **kwargs)
+        finally:
+            _tried_nodes.reset(token)
+
+    async def call_async(self, endpoint: str, fn: typing.Callable, *args, **kwargs):
+        """
+        Awaits the coroutine function fn with retries, see call
+        """
+        self._start_call(endpoint)
+        token = _tried_nodes.set(set())
+        try:
+            return await AsyncRetrying(**self._retrying_kwargs(endpoint))(
+                fn, *args, **kwargs
+            )
+        finally:
+            _tried_nodes.reset(token)
+
+    def stats(self) -> typing.Dict[str, dict]:
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls": calls,
+                    "retries": self.retries.get(endpoint, 0),
+                    "denied": self.denied.get(endpoint, 0),
+                    "tokens": self.tokens.get(endpoint, self.max_tokens),
+                }
+                for endpoint, calls in self.calls.items()
+            }
@@ -0,0 +1,239 @@
+"""
+Pooled keep-alive HTTP client used for every pocket rpc call
+"""
+import asyncio
+import base64
+import json
+import threading
+import typing
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "Accept: application/json",
+}
+# Statuses of a node that is overloaded or failing rather than of a bad query
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RpcStatusError(Exception):
+    """
+    Raised when a node answers with one of RETRYABLE_STATUSES
+    """
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"Node answered {status} to {url}")
+        self.status = status
+        self.url = url
+
+
+class RpcResultError(KeyError):
+    """
+    Raised when a node answers a query of a page without its result, eg with
+    an error body. A KeyError as reading the missing result used to raise
+    """
+
+    def __init__(self, result_key: str, url: str, status: int = None):
+        super().__init__(f"No {result_key} in the answer of {url} ({status})")
+        self.result_key = result_key
+        self.url = url
+        self.status = status
+
+
+def raise_for_retryable_status(status: int, url: str):
+    if status in RETRYABLE_STATUSES:
+        raise RpcStatusError(status, url)
+
+
+class RpcClient:
+    """
+    Thread safe http client that keeps a connection pool per node.
+
+    All threads share one HTTPAdapter (and so one urllib3 PoolManager, which
+    keeps a separate keep-alive pool for every host it talks to), while each
+    thread gets its own lightweight requests.Session on top of it since
+    sessions themselves are not safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 64,
+        pool_maxsize: int = 16,
+        timeout: typing.Optional[float] = 15,
+        page_timeout: typing.Optional[float] = None,
+        auth: typing.Optional[typing.Tuple[str, str]] = None,
+    ):
+        """
+        :param pool_connections: number of per node pools to keep around
+        :param pool_maxsize: max number of kept alive connections per node
+        :param timeout: default timeout in seconds of single object queries
+        :param page_timeout: default timeout of paginated 50k per page queries
+        :param auth: basic auth tuple sent with every request
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.page_timeout = page_timeout
+        self.auth = auth
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=False,
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def post(
+        self,
+        url: str,
+        payload: typing.Optional[dict] = None,
+        paged: bool = False,
+        timeout: typing.Optional[float] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        Posts payload as json to url over a kept alive connection
+        :param url: full url of the rpc endpoint
+        :param payload: json body, no body is sent if None
+        :param paged: use the timeout of paginated queries
+        :param timeout: overrides the timeout of the client if set
+        :param stream: don't read the body before returning
+        :return: requests.Response
+        """
+        if timeout is None:
+            timeout = self.page_timeout if paged else self.timeout
+        return self.session.post(
+            url=url,
+            data=json.dumps(payload) if payload is not None else None,
+            timeout=timeout,
+            auth=self.auth,
+            stream=stream,
+        )
+
+    def close(self):
+        """
+        Closes all pooled connections, the client can still be used afterwards
+        """
+        self._adapter.close()
+
+
+class AsyncRpcClient:
+    """
+    Asyncio counterpart of RpcClient.
+
+    A semaphore bounds the number of queries in flight so thousands of
+    coroutines can be gathered at once without opening thousands of sockets.
+    The aiohttp session and the semaphore belong to the loop they are created
+    in, so one of each is created lazily per running loop and a client can be
+    used by successive asyncio.run calls. The session of a loop has to be
+    closed before the loop is, with close() or by using the client as an
+    async context manager, sessions of loops closed before are dropped
+    unclosed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 256,
+        limit_per_host: int = 32,
+        timeout: typing.Optional[float] = 15,
+        page_timeout: typing.Optional[float] = None,
+        auth: typing.Optional[typing.Tuple[str, str]] = None,
+    ):
+        """
+        :param max_concurrency: max number of queries in flight at once
+        :param limit_per_host: max number of open connections per node
+        :param timeout: default timeout in seconds of single object queries
+        :param page_timeout: default timeout of paginated 50k per page queries
+        :param auth: basic auth tuple sent with every request
+        """
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.page_timeout = aiohttp.ClientTimeout(total=page_timeout)
+        self.headers = dict(HEADERS)
+        if auth is not None:
+            credentials = base64.b64encode(":".join(auth).encode()).decode()
+            self.headers["Authorization"] = f"Basic {credentials}"
+        # Event loop -> its session and semaphore, dropped once the loop closed
+        self._sessions: typing.Dict[
+            asyncio.AbstractEventLoop,
+            typing.Tuple[aiohttp.ClientSession, asyncio.Semaphore],
+        ] = {}
+
+    def _get_session(self) -> typing.Tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        session_semaphore = self._sessions.get(loop)
+        if session_semaphore is None or session_semaphore[0].closed:
+            # Sessions of closed loops can't be closed anymore, only released
+            for other in list(self._sessions):
+                if other.is_closed():
+                    self._sessions.pop(other, None)
+            session_semaphore = self._sessions[loop] = (
+                aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=self.max_concurrency,
+                        limit_per_host=self.limit_per_host,
+                    ),
+                    headers=self.headers,
+                ),
+                asyncio.Semaphore(self.max_concurrency),
+            )
+        return session_semaphore
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The session of the running loop
+        """
+        return self._get_session()[0]
+
+    async def post(
+        self,
+        url: str,
+        payload: typing.Optional[dict] = None,
+        paged: bool = False,
+    ):
+        """
+        Posts payload as json to url and decodes the json response
+        :param url: full url of the rpc endpoint
+        :param payload: json body, no body is sent if None
+        :param paged: use the timeout of paginated queries
+        :return: decoded json response
+        :raises RpcStatusError: if the status is one of RETRYABLE_STATUSES
+        """
+        session, semaphore = self._get_session()
+        async with semaphore:
+            async with session.post(
+                url,
+                data=json.dumps(payload) if payload is not None else None,
+                timeout=self.page_timeout if paged else self.timeout,
+            ) as resp:
+                raise_for_retryable_status(resp.status, url)
+                return await resp.json(content_type=None)
+
+    async def close(self):
+        """
+        Closes the session of the running loop
+        """
+        session_semaphore = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session_semaphore is not None:
+            await session_semaphore[0].close()
+
+    async def __aenter__(self) -> "AsyncRpcClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
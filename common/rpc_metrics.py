@@ -0,0 +1,225 @@
+"""
+Per endpoint and per node metrics of rpc queries
+"""
+import bisect
+import os
+import threading
+import typing
+
+# Upper bounds in seconds of the latency and decode time histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PREFIX = "pokt_rpc"
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Sequence[float]):
+        self.buckets = buckets
+        # Not cumulative, the last count is of the values above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": dict(zip([*self.buckets, float("inf")], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class RequestStats:
+    """
+    What is recorded of the queries of one endpoint to one node
+    """
+
+    def __init__(self, buckets: typing.Sequence[float]):
+        self.latency = Histogram(buckets)
+        self.bytes = 0
+        # Error class -> number of failed queries
+        self.errors: typing.Dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": self.latency.to_dict(),
+            "bytes": self.bytes,
+            "errors": dict(self.errors),
+        }
+
+
+class RpcMetrics:
+    """
+    Latency histograms, response bytes and errors by (endpoint, node), decode
+    time histograms by endpoint and retries by (endpoint, error class).
+
+    Everything is kept in memory and read with snapshot or as the prometheus
+    text format with to_prometheus.
+    """
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        """
+        :param buckets: upper bounds in seconds of the histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._requests: typing.Dict[typing.Tuple[str, str], RequestStats] = {}
+        self._decodes: typing.Dict[str, Histogram] = {}
+        self._retries: typing.Dict[typing.Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record_request(
+        self,
+        endpoint: str,
+        node: str,
+        latency: float,
+        size: int = 0,
+        error: typing.Optional[str] = None,
+    ):
+        """
+        :param endpoint: rpc endpoint, eg "block/"
+        :param node: base url of the node the query was sent to
+        :param latency: seconds the query took
+        :param size: bytes of the response
+        :param error: class of the error if the query failed
+        """
+        with self._lock:
+            stats = self._requests.get((endpoint, node))
+            if stats is None:
+                stats = self._requests[(endpoint, node)] = RequestStats(self.buckets)
+            stats.latency.observe(latency)
+            stats.bytes += size
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def record_decode(self, endpoint: str, seconds: float):
+        with self._lock:
+            histogram = self._decodes.get(endpoint)
+            if histogram is None:
+                histogram = self._decodes[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record_retry(self, endpoint: str, error: str):
+        with self._lock:
+            self._retries[(endpoint, error)] = (
+                self._retries.get((endpoint, error), 0) + 1
+            )
+
+    def reset(self):
+        with self._lock:
+            self._requests, self._decodes, self._retries = {}, {}, {}
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict with "requests" as endpoint -> node -> stats, "decodes"
+            as endpoint -> histogram and "retries" as endpoint -> error -> count
+        """
+        with self._lock:
+            requests = {}
+            for (endpoint, node), stats in self._requests.items():
+                requests.setdefault(endpoint, {})[node] = stats.to_dict()
+            retries = {}
+            for (endpoint, error), count in self._retries.items():
+                retries.setdefault(endpoint, {})[error] = count
+            return {
+                "requests": requests,
+                "decodes": {
+                    endpoint: histogram.to_dict()
+                    for endpoint, histogram in self._decodes.items()
+                },
+                "retries": retries,
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the metrics in the prometheus text exposition format
+        """
+        with self._lock:
+            lines = []
+            _histogram_lines(
+                lines,
+                f"{PREFIX}_request_duration_seconds",
+                "Latency of rpc queries",
+                [
+                    ({"endpoint": endpoint, "node": node}, stats.latency)
+                    for (endpoint, node), stats in self._requests.items()
+                ],
+            )
+            _counter_lines(
+                lines,
+                f"{PREFIX}_response_bytes_total",
+                "Bytes of rpc responses",
+                [
+                    ({"endpoint": endpoint, "node": node}, stats.bytes)
+                    for (endpoint, node), stats in self._requests.items()
+                ],
+            )
+            _counter_lines(
+                lines,
+                f"{PREFIX}_errors_total",
+                "Failed rpc queries by error class",
+                [
+                    ({"endpoint": endpoint, "node": node, "error": error}, count)
+                    for (endpoint, node), stats in self._requests.items()
+                    for error, count in stats.errors.items()
+                ],
+            )
+            _histogram_lines(
+                lines,
+                f"{PREFIX}_decode_duration_seconds",
+                "Time spent decoding rpc responses",
+                [
+                    ({"endpoint": endpoint}, histogram)
+                    for endpoint, histogram in self._decodes.items()
+                ],
+            )
+            _counter_lines(
+                lines,
+                f"{PREFIX}_retries_total",
+                "Retried rpc queries by error class",
+                [
+                    ({"endpoint": endpoint, "error": error}, count)
+                    for (endpoint, error), count in self._retries.items()
+                ],
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Writes to_prometheus atomically to path, eg for the textfile
+        collector of the node exporter
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: typing.Dict[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _counter_lines(lines: list, name: str, help_text: str, samples: list):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in samples:
+        lines.append(f"{name}{{{_labels(labels)}}} {value}")
+
+
+def _histogram_lines(lines: list, name: str, help_text: str, samples: list):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in samples:
+        cumulative = 0
+        for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+            cumulative += count
+            bucket_labels = _labels({**labels, "le": str(bound)})
+            lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+        lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
@@ -0,0 +1,67 @@
+"""
+Coalescing of identical rpc queries that are in flight at the same time
+"""
+import threading
+import typing
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: typing.Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers asking for a key while
+    its call is in flight wait for it and share its result or its exception
+    instead of running the call again.
+
+    Nothing is kept once the call returns, a key asked for again afterwards
+    runs a new call.
+    """
+
+    def __init__(self):
+        self._calls: typing.Dict[typing.Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # Number of calls that were run and that were shared with waiters
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key: typing.Hashable, fn: typing.Callable[[], typing.Any]):
+        """
+        Returns the result of fn, or of the call of fn in flight for key
+        :param key: identifies calls whose results are interchangeable
+        :param fn: called without arguments if no call is in flight for key
+        :raises: the exception of the call shared
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                is_leader = True
+            else:
+                self.shared += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,159 @@
+"""
+Columnar decoding of the txs returned by the blocktxs/ and accounttxs/ queries
+"""
+import typing
+
+import numpy as np
+import pandas as pd
+
+
+def _msg(tx: dict) -> dict:
+    return (tx.get("stdTx") or {}).get("msg") or {}
+
+
+def _msg_value(tx: dict) -> dict:
+    return _msg(tx).get("value") or {}
+
+
+def _relay_proof(tx: dict) -> dict:
+    return (_msg_value(tx).get("leaf") or {}).get("value") or {}
+
+
+def _amount(tx: dict) -> int:
+    value = _msg_value(tx)
+    # Sends carry "amount", stakes carry the staked tokens as "value"
+    amount = value.get("amount", value.get("value"))
+    return int(amount) if isinstance(amount, (str, int)) else 0
+
+
+def _fee(tx: dict) -> int:
+    fees = (tx.get("stdTx") or {}).get("fee") or []
+    return sum(int(fee["amount"]) for fee in fees)
+
+
+def _chain(tx: dict) -> typing.Optional[str]:
+    header = _msg_value(tx).get("header")
+    if header is not None:
+        return header.get("chain")
+    return _relay_proof(tx).get("blockchain")
+
+
+def _session_height(tx: dict) -> int:
+    header = _msg_value(tx).get("header")
+    if header is not None:
+        return int(header.get("session_height") or 0)
+    return int(_relay_proof(tx).get("session_block_height") or 0)
+
+
+# Column -> (top level field of the tx it is read from, dtype, getter)
+TX_COLUMNS: typing.Dict[
+    str, typing.Tuple[str, str, typing.Callable[[dict], typing.Any]]
+] = {
+    # V32 rather than S32, which drops trailing zero bytes when read
+    "hash": ("hash", "V32", lambda tx: bytes.fromhex(tx["hash"])),
+    "height": ("height", "int64", lambda tx: tx["height"]),
+    "index": ("index", "int32", lambda tx: tx.get("index", 0)),
+    "message_type": (
+        "tx_result",
+        "category",
+        lambda tx: tx["tx_result"].get("message_type"),
+    ),
+    "code": ("tx_result", "int32", lambda tx: tx["tx_result"].get("code", 0)),
+    "signer": ("tx_result", "category", lambda tx: tx["tx_result"].get("signer")),
+    "recipient": (
+        "tx_result",
+        "category",
+        lambda tx: tx["tx_result"].get("recipient"),
+    ),
+    "amount": ("stdTx", "int64", _amount),
+    "fee": ("stdTx", "int64", _fee),
+    "chain": ("stdTx", "category", _chain),
+    "session_height": ("stdTx", "int64", _session_height),
+    "total_proofs": (
+        "stdTx",
+        "int64",
+        lambda tx: int(_msg_value(tx).get("total_proofs") or 0),
+    ),
+    "app_public_key": (
+        "stdTx",
+        "category",
+        lambda tx: (_msg_value(tx).get("header") or {}).get("app_public_key"),
+    ),
+}
+
+
+def get_tx_fields(columns: typing.Optional[typing.Iterable[str]] = None) -> set:
+    """
+    Returns the top level fields of the txs needed to decode columns, to be
+    passed as the fields of the paginated tx queries
+    """
+    columns = TX_COLUMNS if columns is None else columns
+    return {TX_COLUMNS[column][0] for column in columns}
+
+
+def decode_tx_columns(
+    pages: typing.Iterable[typing.List[dict]],
+    columns: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Dict[str, typing.Union[np.ndarray, pd.Categorical]]:
+    """
+    Decodes pages of txs into one array per column. Every page is converted
+    as it comes so only the typed columns of the previous pages are held.
+    :param pages: lists of txs, eg iter_txs(height, batches=True)
+    :param columns: columns of TX_COLUMNS to decode, all if None
+    :return: dict, column -> np.ndarray, or pd.Categorical for category columns.
+    hash is a V32 array of the raw 32 bytes of the hashes
+    """
+    columns = list(TX_COLUMNS) if columns is None else list(columns)
+    unknown = [column for column in columns if column not in TX_COLUMNS]
+    if len(unknown):
+        raise ValueError(f"Unknown tx columns: {unknown}")
+
+    chunks = {column: [] for column in columns}
+    # Code of every value of the category columns, None is missing (-1)
+    categories = {column: {None: -1} for column in columns}
+    for page in pages:
+        for column in columns:
+            _, dtype, getter = TX_COLUMNS[column]
+            if dtype == "category":
+                codes = categories[column]
+                values = [codes.setdefault(getter(tx), len(codes) - 1) for tx in page]
+                chunks[column].append(np.array(values, dtype="int32"))
+            else:
+                values = [getter(tx) for tx in page]
+                chunks[column].append(np.array(values, dtype=dtype))
+
+    arrays = {}
+    for column in columns:
+        dtype = TX_COLUMNS[column][1]
+        values = (
+            np.concatenate(chunks[column])
+            if len(chunks[column])
+            else np.array([], dtype="int32" if dtype == "category" else dtype)
+        )
+        if dtype == "category":
+            values = pd.Categorical.from_codes(
+                values, categories=list(categories[column])[1:]
+            )
+        arrays[column] = values
+    return arrays
+
+
+def decode_txs(
+    pages: typing.Iterable[typing.List[dict]],
+    columns: typing.Optional[typing.Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Decodes pages of txs into a frame with one typed column per tx field,
+    message types, addresses and chains as categoricals, int64 amounts.
+    pandas has no fixed width bytes dtype so hash is kept as 32 bytes objects,
+    decode_tx_columns returns it as a V32 array.
+    :param pages: lists of txs, eg iter_txs(height, batches=True)
+    :param columns: columns of TX_COLUMNS to decode, all if None
+    :return: pd.DataFrame
+    """
+    arrays = decode_tx_columns(pages, columns)
+    if "hash" in arrays:
+        arrays["hash"] = np.array(
+            [value.tobytes() for value in arrays["hash"]], dtype=object
+        )
+    return pd.DataFrame(arrays, columns=list(arrays))
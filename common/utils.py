@@ -1,29 +1,77 @@
 import ast
+import collections
+import functools
 import hashlib
+import itertools
 import json
-import random
+import os
+import threading
+import time
 import typing
-from multiprocessing import Pool
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import cryptography.hazmat.primitives.asymmetric.ed25519 as ed25519
 import hexbytes
+import numpy as np
 import pandas as pd
-import requests
 from cryptography.hazmat.primitives import serialization
-from tenacity import retry, stop_after_attempt
+
+from common import json_decoding
+from common.block_cache import BlockCache
+from common.block_time_index import BlockTimeIndex
+from common.hedging import HedgePolicy
+from common.node_pool import NodePool
+from common.node_prober import NodeProber
+from common.param_timeline import ParamTimeline
+from common.retry_policy import RetryPolicy, get_tried_nodes, record_tried_node
+from common.rpc_client import RpcClient, RpcResultError, raise_for_retryable_status
+from common.rpc_metrics import LATENCY_BUCKETS, RpcMetrics
+from common.single_flight import SingleFlight
+from common.tx_utils import decode_txs, get_tx_fields
 
 POKT_MULTIPLIER = 1000000
 MAINNET_URL = ""
 VALID_URLS = []
 USERNAME, PASSWORD = "", ""
 AUTH = (USERNAME, PASSWORD)
+CLIENT = RpcClient(auth=AUTH)
+# Picks the node of every query among VALID_URLS
+NODE_POOL = NodePool(VALID_URLS)
+# List and length of VALID_URLS the node pool was last synced with
+NODE_POOL_SOURCE: typing.Tuple[typing.List[str], int] = (VALID_URLS, len(VALID_URLS))
+# Timeout in seconds of node health probes
+PROBE_TIMEOUT = 2
+# Max number of pages of a paginated query fetched concurrently
+PAGE_WORKERS = 8
+# Retries of every rpc helper
+RETRY_POLICY = RetryPolicy()
+# Set by enable_rpc_metrics
+RPC_METRICS: typing.Optional[RpcMetrics] = None
+# Set by enable_block_cache
+BLOCK_CACHE: typing.Optional[BlockCache] = None
+# Set by enable_hedging
+HEDGE_POLICY: typing.Optional[HedgePolicy] = None
+# Set by enable_param_timeline
+PARAM_TIMELINE: typing.Optional[ParamTimeline] = None
+# Number of heights whose nodes are kept indexed by address
+NODES_SNAPSHOTS_SIZE = 4
+NODES_SNAPSHOTS: "collections.OrderedDict[int, typing.Dict[str, dict]]" = (
+    collections.OrderedDict()
+)
+NODES_SNAPSHOTS_LOCK = threading.Lock()
+# Number of heights whose total supply is kept, least recently used first out
+SUPPLY_CACHE_SIZE = 100_000
+# Total supply by height, filled by get_supply_series
+SUPPLY_CACHE: "collections.OrderedDict[int, int]" = collections.OrderedDict()
+SUPPLY_CACHE_LOCK = threading.Lock()
+# Coalesces identical queries in flight, None if disabled
+SINGLE_FLIGHT: typing.Optional[SingleFlight] = SingleFlight()
 
 
 def get_url(main=False):
     if main:
         return f"{MAINNET_URL}v1/query/"
-    rand_int = random.randint(0, len(VALID_URLS) - 1)
-    return f"{VALID_URLS[rand_int]}v1/query/"
+    return f"{get_node_pool().pick()}v1/query/"
 
 
 def get_valid_urls():
@@ -31,14 +79,392 @@ def get_valid_urls():
 
 
 def set_valid_urls(urls: typing.List[str]):
-    global VALID_URLS
+    global VALID_URLS, NODE_POOL_SOURCE
     VALID_URLS = urls
+    NODE_POOL.set_urls(urls)
+    NODE_POOL_SOURCE = (urls, len(urls))
+
+
+def get_node_pool() -> NodePool:
+    """
+    Returns the node pool, first syncing it with VALID_URLS if the list was
+    replaced or grew or shrank in place since the last sync
+    """
+    global NODE_POOL_SOURCE
+    urls = VALID_URLS
+    source, length = NODE_POOL_SOURCE
+    if source is not urls or length != len(urls):
+        NODE_POOL.set_urls(urls)
+        NODE_POOL_SOURCE = (urls, len(urls))
+    return NODE_POOL
+
+
+def probe_node(base_url: str) -> int:
+    """
+    Returns the height of a node, with a tight timeout and no retries
+    """
+    resp = CLIENT.post(f"{base_url}v1/query/height/", timeout=PROBE_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()["height"]
+
+
+def start_node_health_probe(interval: float = 10):
+    """
+    Probes ejected nodes in the background and brings them back once healthy
+    """
+    NODE_POOL.start_health_probe(probe_node, interval=interval)
+
+
+def get_client() -> RpcClient:
+    return CLIENT
+
+
+def get_retry_policy() -> RetryPolicy:
+    return RETRY_POLICY
+
+
+def set_retry_policy(retry_policy: RetryPolicy):
+    """
+    Replaces the retry policy shared by the rpc helpers
+    """
+    global RETRY_POLICY
+    if retry_policy.on_retry is None:
+        retry_policy.on_retry = record_retry
+    RETRY_POLICY = retry_policy
+
+
+def retry_rpc(endpoint: str):
+    """
+    Retries the decorated rpc helper with the shared retry policy
+    :param endpoint: rpc endpoint the helper queries, its retries are budgeted
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return RETRY_POLICY.call(endpoint, fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_client(client: RpcClient):
+    """
+    Replaces the shared client, eg to change pool sizes or timeouts
+    """
+    global CLIENT
+    old_client, CLIENT = CLIENT, client
+    old_client.close()
+
+
+def query(
+    endpoint: str,
+    payload: typing.Optional[dict] = None,
+    url: typing.Optional[str] = None,
+    paged: bool = False,
+):
+    """
+    Posts payload to endpoint of a node through the shared pooled client,
+    reading through the block cache if enabled. Identical queries in flight
+    from other threads are shared instead of being sent again.
+    :param endpoint: rpc query endpoint, eg "block/"
+    :param payload: json body of the query
+    :param url: query url of a node, picked from the node pool if None
+    :param paged: whether the query is a paginated one
+    :return: decoded json response
+    """
+    content = query_content(endpoint, payload, url, paged)
+    metrics = RPC_METRICS
+    if metrics is None:
+        return json_decoding.loads(content)
+    start = time.perf_counter()
+    resp = json_decoding.loads(content)
+    metrics.record_decode(endpoint, time.perf_counter() - start)
+    return resp
+
+
+def query_content(
+    endpoint: str,
+    payload: typing.Optional[dict] = None,
+    url: typing.Optional[str] = None,
+    paged: bool = False,
+) -> bytes:
+    """
+    Same as query but returns the body of the response undecoded
+    """
+    cache = BLOCK_CACHE
+    if cache is not None and cache.is_cacheable(endpoint, payload):
+        content = cache.get(endpoint, payload)
+        if content is not None:
+            return content
+    else:
+        cache = None
+
+    def fetch() -> bytes:
+        content, is_ok = fetch_content(endpoint, payload, url, paged)
+        if cache is not None and is_ok:
+            cache.put(endpoint, payload, content)
+        return content
+
+    single_flight = SINGLE_FLIGHT
+    if single_flight is None:
+        return fetch()
+    key = (endpoint, json.dumps(payload, sort_keys=True), url, paged)
+    return single_flight.do(key, fetch)
+
+
+def query_page(
+    endpoint: str,
+    payload: dict,
+    result_key: str,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+) -> dict:
+    """
+    Posts a query of a page of a paginated endpoint and decodes its result
+    array incrementally, streaming it from the socket unless it is read
+    through the block cache
+    :param endpoint: rpc query endpoint, eg "nodes/"
+    :param payload: json body of the query
+    :param result_key: key of the result array in the response
+    :param fields: keys of the result items to keep, all if None
+    :return: dict, the top level scalars of the page and the result array
+    """
+    cache = BLOCK_CACHE
+    if (
+        cache is not None and cache.is_cacheable(endpoint, payload)
+    ) or not json_decoding.can_stream():
+        content = query_content(endpoint, payload, paged=True)
+        return json_decoding.decode_page(content, result_key, fields)
+
+    node = acquire_node()
+    record_tried_node(node)
+    start = time.perf_counter()
+    try:
+        resp = CLIENT.post(
+            f"{node}v1/query/{endpoint}", payload, paged=True, stream=True
+        )
+        try:
+            raise_for_retryable_status(resp.status_code, resp.url)
+            if not resp.ok:
+                raise RpcResultError(result_key, resp.url, resp.status_code)
+            resp.raw.decode_content = True
+            decode_start = time.perf_counter()
+            page = json_decoding.decode_page(resp.raw, result_key, fields)
+            # Reading the body from the socket is part of the decode time
+            decode_time = time.perf_counter() - decode_start
+            # Drain what is left so the connection goes back to the pool
+            resp.raw.read()
+            resp.raw.release_conn()
+        except Exception:
+            resp.close()
+            raise
+    except Exception as e:
+        latency = time.perf_counter() - start
+        NODE_POOL.release(node, latency, False)
+        record_request(endpoint, node, latency, error=type(e).__name__)
+        raise
+    latency = time.perf_counter() - start
+    NODE_POOL.release(node, latency, resp.ok)
+    record_request(endpoint, node, latency, resp.raw.tell(), response_error(resp))
+    metrics = RPC_METRICS
+    if metrics is not None:
+        metrics.record_decode(endpoint, decode_time)
+    return page
+
+
+def fetch_content(
+    endpoint: str,
+    payload: typing.Optional[dict] = None,
+    url: typing.Optional[str] = None,
+    paged: bool = False,
+) -> typing.Tuple[bytes, bool]:
+    """
+    :return: body of the response and whether the status was ok
+    """
+    if url is not None:
+        start = time.perf_counter()
+        try:
+            resp = CLIENT.post(url + endpoint, payload, paged=paged)
+            raise_for_retryable_status(resp.status_code, resp.url)
+        except Exception as e:
+            record_request(
+                endpoint, url, time.perf_counter() - start, error=type(e).__name__
+            )
+            raise
+        record_request(
+            endpoint,
+            url,
+            time.perf_counter() - start,
+            len(resp.content),
+            response_error(resp),
+        )
+        return resp.content, resp.ok
+
+    hedge_policy = HEDGE_POLICY
+    if hedge_policy is not None and hedge_policy.applies(endpoint):
+        return hedge_policy.run(
+            lambda node: post_to_node(node, endpoint, payload, paged),
+            get_node_pool(),
+            exclude=get_tried_nodes(),
+        )
+    return post_to_node(acquire_node(), endpoint, payload, paged)
+
+
+def acquire_node() -> str:
+    """
+    Acquires a node from the node pool, a different one than the previous
+    attempts of the call in progress if there is one
+    """
+    return get_node_pool().acquire(exclude=get_tried_nodes())
+
+
+def post_to_node(
+    node: str,
+    endpoint: str,
+    payload: typing.Optional[dict] = None,
+    paged: bool = False,
+) -> typing.Tuple[bytes, bool]:
+    """
+    Posts payload to endpoint of a node acquired from the node pool and
+    releases it with the outcome
+    :return: body of the response and whether the status was ok
+    :raises RpcStatusError: if the node answered a retryable status
+    """
+    record_tried_node(node)
+    start = time.perf_counter()
+    try:
+        resp = CLIENT.post(f"{node}v1/query/{endpoint}", payload, paged=paged)
+        raise_for_retryable_status(resp.status_code, resp.url)
+    except Exception as e:
+        latency = time.perf_counter() - start
+        NODE_POOL.release(node, latency, False)
+        record_request(endpoint, node, latency, error=type(e).__name__)
+        raise
+    latency = time.perf_counter() - start
+    NODE_POOL.release(node, latency, resp.ok)
+    record_request(endpoint, node, latency, len(resp.content), response_error(resp))
+    return resp.content, resp.ok
+
+
+def response_error(resp) -> typing.Optional[str]:
+    """
+    :return: error class of a response that isn't ok, None if it is
+    """
+    return None if resp.ok else f"http_{resp.status_code}"
+
+
+def record_request(
+    endpoint: str,
+    node: str,
+    latency: float,
+    size: int = 0,
+    error: typing.Optional[str] = None,
+):
+    """
+    Records a query in the rpc metrics if enabled
+    """
+    metrics = RPC_METRICS
+    if metrics is not None:
+        metrics.record_request(endpoint, node, latency, size, error)
+
+
+def record_retry(endpoint: str, error: BaseException):
+    metrics = RPC_METRICS
+    if metrics is not None:
+        metrics.record_retry(endpoint, type(error).__name__)
+
+
+def enable_rpc_metrics(
+    buckets: typing.Sequence[float] = LATENCY_BUCKETS,
+) -> RpcMetrics:
+    """
+    Records latency, response bytes, decode time, errors and retries of every
+    query by endpoint and node, read them with RPC_METRICS.snapshot() or
+    RPC_METRICS.to_prometheus()
+    :param buckets: upper bounds in seconds of the histogram buckets
+    """
+    global RPC_METRICS
+    RPC_METRICS = RpcMetrics(buckets)
+    RETRY_POLICY.on_retry = record_retry
+    return RPC_METRICS
+
+
+def disable_rpc_metrics():
+    global RPC_METRICS
+    RPC_METRICS = None
+
+
+def get_rpc_metrics() -> typing.Optional[RpcMetrics]:
+    return RPC_METRICS
+
+
+def enable_hedging(
+    delay: typing.Optional[float] = None, budget: float = 0.05, **kwargs
+) -> HedgePolicy:
+    """
+    Hedges idempotent single object queries, see HedgePolicy for the options
+    :param delay: seconds before hedging, the p95 latency of the pool if None
+    :param budget: max ratio of hedged queries
+    """
+    global HEDGE_POLICY
+    disable_hedging()
+    HEDGE_POLICY = HedgePolicy(delay=delay, budget=budget, **kwargs)
+    return HEDGE_POLICY
+
+
+def disable_hedging():
+    global HEDGE_POLICY
+    hedge_policy, HEDGE_POLICY = HEDGE_POLICY, None
+    if hedge_policy is not None:
+        hedge_policy.shutdown()
+
+
+def enable_block_cache(
+    path: str, max_bytes: int = 2 * 1024**3, finality_depth: int = 10, **kwargs
+) -> BlockCache:
+    """
+    Caches responses at finalized heights in a sqlite file at path, see
+    BlockCache for the rest of the options
+    """
+    global BLOCK_CACHE
+    BLOCK_CACHE = BlockCache(
+        path,
+        get_last_block_height,
+        max_bytes=max_bytes,
+        finality_depth=finality_depth,
+        **kwargs,
+    )
+    return BLOCK_CACHE
+
+
+def enable_single_flight() -> SingleFlight:
+    global SINGLE_FLIGHT
+    if SINGLE_FLIGHT is None:
+        SINGLE_FLIGHT = SingleFlight()
+    return SINGLE_FLIGHT
+
+
+def disable_single_flight():
+    global SINGLE_FLIGHT
+    SINGLE_FLIGHT = None
+
+
+def disable_block_cache():
+    global BLOCK_CACHE
+    cache, BLOCK_CACHE = BLOCK_CACHE, None
+    if cache is not None:
+        cache.close()
+
+
+def get_node_url(i: int) -> str:
+    return f"http://node{i}.thunderstake.io/"
 
 
 def validate_url(i, last_height):
-    base_url = f"http://node{i}.thunderstake.io/"
+    base_url = get_node_url(i)
     try:
-        height = get_last_block_height(f"{base_url}v1/query/")
+        height = probe_node(base_url)
         if last_height >= height and last_height - height < 3:
             return base_url
     except Exception as e:
@@ -46,55 +472,58 @@ def validate_url(i, last_height):
     return None
 
 
+def get_node_prober(from_node: int = 1700, to_node: int = 1995) -> NodeProber:
+    """
+    Returns a prober of the nodes in the range that swaps the nodes within
+    3 blocks of the latest height of the main url into VALID_URLS
+    """
+
+    def update_valid_urls(urls: typing.List[str]):
+        set_valid_urls(urls)
+        NODE_POOL.record_heights(
+            {url: prober.heights[url] for url in urls if prober.heights[url]}
+        )
+
+    prober = NodeProber(
+        [get_node_url(i) for i in range(from_node, to_node)],
+        probe_node,
+        lambda: get_last_block_height(get_url(True)),
+        update_valid_urls,
+    )
+    return prober
+
+
 def generate_valid_urls(from_node: int = 1700, to_node: int = 1995):
     """
     Get all urls of nodes that are within 3 blocks of
     the latest height that we get from portal api
     """
-    global VALID_URLS
-    url = get_url(True)
-    last_height = get_last_block_height(url)
-    with Pool(processes=8) as tp:
-        node_range = range(from_node, to_node)
-        result = tp.starmap_async(validate_url, [(i, last_height) for i in node_range])
-        for value in result.get():
-            if value:
-                VALID_URLS.append(value)
+    get_node_prober(from_node, to_node).probe()
 
 
-@retry(stop=stop_after_attempt(5))
+def start_valid_urls_refresh(
+    from_node: int = 1700, to_node: int = 1995, interval: float = 60
+) -> NodeProber:
+    """
+    Regenerates the valid urls every interval seconds in the background,
+    prober.lags tells how far behind the tip each node was at the last probe
+    """
+    prober = get_node_prober(from_node, to_node)
+    prober.start(interval)
+    return prober
+
+
+@retry_rpc("supply/")
 def get_supply(height):
-    url = get_url()
-    supply_req = requests.post(
-        url=url + "supply/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height}),
-        timeout=15,
-        auth=AUTH,
-    )
-    supply = supply_req.json()
+    supply = query("supply/", {"height": height})
     total_supply = int(supply["total"])
 
     return total_supply
 
 
-@retry(stop=stop_after_attempt(5))
+@retry_rpc("balance/")
 def balance(address, height):
-    url = get_url()
-    account_txs = requests.post(
-        url=url + "balance/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"address": address, "height": height}),
-        timeout=15,
-        auth=AUTH,
-    )
-    bal = account_txs.json()
+    bal = query("balance/", {"address": address, "height": height})
     bal = int(bal["balance"])
 
     return bal
@@ -122,60 +551,98 @@ def get_output_address(address, height):
     return output_address
 
 
-@retry(stop=stop_after_attempt(5))
+@retry_rpc("node/")
 def get_node_info(address: str, height: int):
-    url = get_url()
-    req = requests.post(
-        url=url + "node/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"address": address, "height": height}),
-        timeout=15,
-        auth=AUTH,
-    )
-    resp = req.json()
+    resp = query("node/", {"address": address, "height": height})
     return resp
 
 
-@retry(stop=stop_after_attempt(5))
+def get_nodes_snapshot(height: int) -> typing.Dict[str, dict]:
+    """
+    Returns all the nodes at height indexed by address, fetched with one
+    paginated nodes query. The snapshots of the last NODES_SNAPSHOTS_SIZE
+    heights are kept, the tip (height 0) is never kept.
+    The snapshot is shared between callers and must not be modified.
+    :param height:
+    :return: dict, address -> node
+    """
+    with NODES_SNAPSHOTS_LOCK:
+        snapshot = NODES_SNAPSHOTS.get(height)
+        if snapshot is not None:
+            NODES_SNAPSHOTS.move_to_end(height)
+            return snapshot
+
+    def build() -> typing.Dict[str, dict]:
+        return {
+            node["address"]: node for node in iter_nodes(height, prefetch=PAGE_WORKERS)
+        }
+
+    single_flight = SINGLE_FLIGHT
+    if single_flight is None:
+        snapshot = build()
+    else:
+        snapshot = single_flight.do(("nodes_snapshot", height), build)
+    if height > 0:
+        with NODES_SNAPSHOTS_LOCK:
+            NODES_SNAPSHOTS[height] = snapshot
+            while len(NODES_SNAPSHOTS) > NODES_SNAPSHOTS_SIZE:
+                NODES_SNAPSHOTS.popitem(last=False)
+    return snapshot
+
+
+def get_nodes_info(
+    addresses: typing.Iterable[str], height: int
+) -> typing.Dict[str, typing.Optional[dict]]:
+    """
+    Bulk get_node_info answered from the nodes snapshot of height
+    :return: dict, address -> node, None if the address isn't a node
+    """
+    snapshot = get_nodes_snapshot(height)
+    return {address: snapshot.get(address) for address in addresses}
+
+
+def node_balances(
+    addresses: typing.Iterable[str], height: int
+) -> typing.Dict[str, int]:
+    """
+    Bulk node_balance answered from the nodes snapshot of height
+    :return: dict, address -> staked tokens, 0 if the address isn't a node
+    """
+    return {
+        address: int(node["tokens"]) if node is not None else 0
+        for address, node in get_nodes_info(addresses, height).items()
+    }
+
+
+def get_output_addresses(
+    addresses: typing.Iterable[str], height: int
+) -> typing.Dict[str, str]:
+    """
+    Bulk get_output_address answered from the nodes snapshot of height
+    :return: dict, address -> output address, the address itself if it isn't
+    a node or has no output address
+    """
+    return {
+        address: (node or {}).get("output_address") or address
+        for address, node in get_nodes_info(addresses, height).items()
+    }
+
+
+@retry_rpc("block/")
 def get_block(height: int):
     """
     :param height:
     :return: dict, information at block height
     """
-    url = get_url()
-    block_req = requests.post(
-        url=url + "block/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height}),
-        timeout=15,
-        auth=AUTH,
-    )
-    return block_req.json()
+    return query("block/", {"height": height})
 
 
-@retry(stop=stop_after_attempt(5))
+@retry_rpc("height/")
 def get_last_block(url=None):
     """
     :return: dict, last POKT block information
     """
-    if url is None:
-        url = get_url()
-    last_block_req = requests.post(
-        url=url + "height/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        timeout=15,
-        auth=AUTH,
-    )
-    return last_block_req.json()
+    return query("height/", url=url)
 
 
 def get_block_height(height: int):
@@ -198,123 +665,121 @@ def get_last_block_height(url=None):
     return last_block["height"]
 
 
+# In memory until enable_block_time_index, warms up with every resolved timestamp
+BLOCK_TIME_INDEX = BlockTimeIndex(get_block_ts, get_last_block_height)
+
+
 def get_block_height_at_timestamp(ts: pd.Timestamp):
     """
-    Binary searches for closest height to ts
+    Returns the first height with a block time at or after ts, interpolation
+    searching the block time index
     :param ts:
     :return: int
     """
-    last = get_last_block_height()
-    first = 42052
-    mid = 0
-    while first <= last:
-        mid = (last + first) // 2
-        block_ts = get_block_ts(mid)
-        if ts > block_ts:
-            first = mid + 1
-        else:
-            last = mid - 1
-        if block_ts == ts:
-            return mid
-    return mid
+    return BLOCK_TIME_INDEX.height_at(ts)
+
+
+def get_heights_at_timestamps(
+    timestamps: typing.Iterable[pd.Timestamp],
+) -> typing.List[int]:
+    """
+    Batch get_block_height_at_timestamp, resolves all timestamps in one pass
+    """
+    return BLOCK_TIME_INDEX.heights_at(timestamps)
 
 
 def get_date_to_height_map(dates: pd.DatetimeIndex) -> typing.MutableMapping[str, int]:
-    date_to_height_map = {}
-    for date in dates:
-        date_to_height_map[str(date)[:10]] = get_block_height_at_timestamp(date)
-    return date_to_height_map
+    heights = get_heights_at_timestamps(dates)
+    return {str(date)[:10]: height for date, height in zip(dates, heights)}
+
+
+def enable_block_time_index(path: str, step: int = 96) -> BlockTimeIndex:
+    """
+    Loads the block time index persisted at path, building it first if it
+    doesn't exist, and extends it up to the tip
+    :param path: json file of the index
+    :param step: heights between two indexed blocks
+    """
+    global BLOCK_TIME_INDEX
+    index = BlockTimeIndex(get_block_ts, get_last_block_height, path=path)
+    index.extend(step=step)
+    BLOCK_TIME_INDEX = index
+    return index
+
+
+@retry_rpc("allparams/")
+def query_all_params(height: int):
+    return query("allparams/", {"height": height})
 
 
-@retry(stop=stop_after_attempt(5))
 def get_all_params(height: int):
     """
-    Returns the relay to token multiplier
+    Returns all params at height, from the param timeline if enabled
     :param height:
-    :return: float
+    :return: dict
     """
-    url = get_url()
-    param_req = requests.post(
-        url=url + "allparams/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height}),
-        auth=AUTH,
-    )
+    if PARAM_TIMELINE is not None and PARAM_TIMELINE.covers(height):
+        return PARAM_TIMELINE.get_all(height)
+    return query_all_params(height)
+
 
-    return param_req.json()
+@retry_rpc("param/")
+def query_param(height: int, key: str):
+    return query("param/", {"height": height, "key": key})["param_value"]
 
 
-@retry(stop=stop_after_attempt(5))
 def get_param(height: int, key: str):
-    url = get_url()
-    param_req = requests.post(
-        url=url + "param/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height, "key": key}),
-        auth=AUTH,
-    )
-    return param_req.json()["param_value"]
+    """
+    Returns the value of param key at height, from the param timeline if enabled
+    """
+    if PARAM_TIMELINE is not None and PARAM_TIMELINE.covers(height, key):
+        return PARAM_TIMELINE.get(key, height)
+    return query_param(height, key)
+
+
+def enable_param_timeline(from_height: int = 1) -> ParamTimeline:
+    """
+    Builds the timeline of all params from from_height up to the tip, param
+    getters answer from it without a network call afterwards
+    """
+    global PARAM_TIMELINE
+    timeline = ParamTimeline(query_all_params, get_last_block_height)
+    timeline.build(from_height)
+    PARAM_TIMELINE = timeline
+    return timeline
+
+
+def disable_param_timeline():
+    global PARAM_TIMELINE
+    PARAM_TIMELINE = None
+
+
+def get_param_timeline() -> typing.Optional[ParamTimeline]:
+    return PARAM_TIMELINE
 
 
-@retry(stop=stop_after_attempt(5))
 def get_pip22_height(height: int):
+    """
+    Returns the height of the PIP-22 upgrade, 69232 if it isn't in the
+    upgrade param at height. Query errors are raised.
+    """
+    param = get_param(height, "gov/upgrade")
     try:
-        url = get_url()
-        param_req = requests.post(
-            url=url + "param/",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "Accept: application/json",
-            },
-            data=json.dumps({"height": height, "key": "gov/upgrade"}),
-            auth=AUTH,
-        )
-        features = ast.literal_eval(param_req.json()["param_value"])["value"][
-            "Features"
-        ]
-        for feature in features:
-            if "RSCAL" in feature:
-                return int(feature.split(":")[1])
-    except Exception:
-        return 69232
-    finally:
+        features = ast.literal_eval(param)["value"]["Features"]
+    except (ValueError, SyntaxError, KeyError, TypeError):
         return 69232
+    for feature in features:
+        if "RSCAL" in feature:
+            return int(feature.split(":")[1])
+    return 69232
 
 
-@retry(stop=stop_after_attempt(5))
 def get_dao_allocation(height: int):
-    url = get_url()
-    param_req = requests.post(
-        url=url + "param/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height, "key": "pos/DAOAllocation"}),
-        auth=AUTH,
-    )
-    return float(param_req.json()["param_value"])
+    return float(get_param(height, "pos/DAOAllocation"))
 
 
-@retry(stop=stop_after_attempt(5))
 def get_proposer_percentage(height: int):
-    url = get_url()
-    param_req = requests.post(
-        url=url + "param/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps({"height": height, "key": "pos/ProposerPercentage"}),
-        auth=AUTH,
-    )
-    return float(param_req.json()["param_value"])
+    return float(get_param(height, "pos/ProposerPercentage"))
 
 
 def get_reward_percentage(height: int):
@@ -323,131 +788,453 @@ def get_reward_percentage(height: int):
     return 1 - (dao_allocation + proposer_percentage) / 100
 
 
-@retry(stop=stop_after_attempt(5))
 def get_relay_to_tokens_multiplier(height: int):
     """
     Returns the relay to token multiplier
     :param height:
     :return: float
     """
-    url = get_url()
-    param_req = requests.post(
-        url=url + "param/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
+    return float(get_param(height, "pos/RelaysToTokensMultiplier"))
+
+
+# Columns of get_reward_params_frame -> param key
+REWARD_PARAMS = {
+    "dao_allocation": "pos/DAOAllocation",
+    "proposer_percentage": "pos/ProposerPercentage",
+    "relays_to_tokens_multiplier": "pos/RelaysToTokensMultiplier",
+    "stake_weight_multiplier": "pos/ServicerStakeWeightMultiplier",
+}
+
+
+def get_reward_params_frame(from_height: int, to_height: int) -> pd.DataFrame:
+    """
+    Returns the reward params of every height in [from_height, to_height],
+    built from the heights the params changed at only. Uses the param
+    timeline if enabled and covering the range, otherwise builds a timeline
+    of the range, about log2(range) allparams queries per change.
+    :param from_height:
+    :param to_height: included
+    :return: pd.DataFrame indexed by height with the REWARD_PARAMS columns and
+    reward_percentage, NaN where a param didn't exist yet
+    """
+    timeline = PARAM_TIMELINE
+    if timeline is None or not (
+        timeline.covers(from_height) and timeline.covers(to_height)
+    ):
+        timeline = ParamTimeline(query_all_params, get_last_block_height)
+        timeline.build(from_height, to_height)
+
+    index = pd.RangeIndex(from_height, to_height + 1, name="height")
+    frame = pd.DataFrame(index=index)
+    for column, key in REWARD_PARAMS.items():
+        changes = {}
+        try:
+            intervals = timeline.intervals(key)
+        except KeyError:
+            intervals = []
+        for start, end, value in intervals:
+            if end >= from_height and start <= to_height:
+                changes[max(start, from_height)] = float(value)
+        frame[column] = pd.Series(changes, dtype="float64").reindex(index).ffill()
+    frame["reward_percentage"] = (
+        1 - (frame["dao_allocation"] + frame["proposer_percentage"]) / 100
+    )
+    return frame
+
+
+def get_page(
+    endpoint: str,
+    payload: dict,
+    result_key: str,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+):
+    """
+    Returns one page of a paginated query, with retries
+    :param fields: keys of the result items to keep, all if None
+    :return: dict, the top level scalars of the page and the result array
+    """
+
+    def query_once():
+        page = query_page(endpoint, payload, result_key, fields)
+        if result_key not in page:
+            raise RpcResultError(result_key, endpoint)
+        # Nodes answer null rather than [] past the last page
+        if page[result_key] is None:
+            page[result_key] = []
+        return page
+
+    return RETRY_POLICY.call(endpoint, query_once)
+
+
+def iter_pages(
+    endpoint: str,
+    page_payload: typing.Callable[[int], dict],
+    result_key: str,
+    window: int = PAGE_WORKERS,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Iterator[typing.List[dict]]:
+    """
+    Yields the pages of a paginated query in page order while fetching up to
+    window pages ahead concurrently, each from a node picked by get_url.
+
+    If the first page tells the total number of pages, the rest of the pages
+    are requested up to window at a time, otherwise pages are requested in
+    windows that double in size until the first empty page.
+    :param endpoint: rpc query endpoint, eg "nodes/"
+    :param page_payload: returns the json body of the query for a page number
+    :param result_key: key of the page results in the response
+    :param window: max number of pages in flight
+    :param fields: keys of the results to keep, all if None
+    """
+    first_page = get_page(endpoint, page_payload(1), result_key, fields)
+    total_pages = first_page.get("total_pages")
+    if total_pages is not None:
+        pages, in_flight = iter(range(2, total_pages + 1)), window
+    elif len(first_page[result_key]):
+        pages, in_flight = itertools.count(2), 1
+    else:
+        pages, in_flight = iter(()), 0
+
+    executor = ThreadPoolExecutor(max_workers=window)
+    futures = collections.deque()
+    try:
+        results = first_page[result_key]
+        del first_page
+        while True:
+            # Keep the next pages in flight while the caller consumes this one
+            for page in itertools.islice(pages, in_flight - len(futures)):
+                futures.append(
+                    executor.submit(
+                        get_page, endpoint, page_payload(page), result_key, fields
+                    )
+                )
+            yield results
+            if not futures:
+                return
+            results = futures.popleft().result()[result_key]
+            if total_pages is None:
+                if not len(results):
+                    return
+                # Widen the window since the query didn't end yet
+                in_flight = min(in_flight * 2, window)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_paginated(
+    endpoint: str,
+    page_payload: typing.Callable[[int], dict],
+    result_key: str,
+    batches: bool = False,
+    prefetch: int = 1,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+) -> typing.Iterator:
+    pages = iter_pages(
+        endpoint, page_payload, result_key, window=prefetch, fields=fields
+    )
+    if batches:
+        yield from pages
+    else:
+        for page in pages:
+            yield from page
+
+
+def iter_txs(
+    height: int,
+    batches: bool = False,
+    prefetch: int = 1,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+):
+    """
+    Yields the txs of a block while the next page is fetched in the background
+    :param height:
+    :param batches: yield a list per page instead of single txs
+    :param prefetch: number of pages fetched ahead
+    :param fields: keys of the items to keep, all if None
+    """
+    return iter_paginated(
+        "blocktxs/",
+        lambda page: {"height": height, "page": page, "per_page": 50000},
+        "txs",
+        batches=batches,
+        prefetch=prefetch,
+        fields=fields,
+    )
+
+
+def iter_claims(
+    height: int,
+    address: str = "",
+    batches: bool = False,
+    prefetch: int = 1,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+):
+    """
+    Yields the claims at height while the next page is fetched in the background
+    :param height:
+    :param address: only claims of this node if not empty
+    :param batches: yield a list per page instead of single claims
+    :param prefetch: number of pages fetched ahead
+    :param fields: keys of the items to keep, all if None
+    """
+    return iter_paginated(
+        "nodeclaims/",
+        lambda page: {
+            "height": height,
+            "page": page,
+            "per_page": 50000,
+            "address": address,
         },
-        data=json.dumps({"height": height, "key": "pos/RelaysToTokensMultiplier"}),
-        auth=AUTH,
+        "result",
+        batches=batches,
+        prefetch=prefetch,
+        fields=fields,
+    )
+
+
+def iter_account_txs(
+    height: int,
+    address: str = "",
+    batches: bool = False,
+    prefetch: int = 1,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+):
+    """
+    Yields the txs of an account while the next page is fetched in the background
+    :param height:
+    :param address:
+    :param batches: yield a list per page instead of single txs
+    :param prefetch: number of pages fetched ahead
+    :param fields: keys of the items to keep, all if None
+    """
+    return iter_paginated(
+        "accounttxs/",
+        lambda page: {
+            "address": address,
+            "height": height,
+            "page": page,
+            "per_page": 50000,
+        },
+        "txs",
+        batches=batches,
+        prefetch=prefetch,
+        fields=fields,
+    )
+
+
+def iter_nodes(
+    height: int,
+    batches: bool = False,
+    prefetch: int = 1,
+    fields: typing.Optional[typing.Iterable[str]] = None,
+):
+    """
+    Yields the nodes at height while the next page is fetched in the background
+    :param height:
+    :param batches: yield a list per page instead of single nodes
+    :param prefetch: number of pages fetched ahead
+    :param fields: keys of the items to keep, all if None
+    """
+    return iter_paginated(
+        "nodes/",
+        lambda page: {"height": height, "opts": {"page": page, "per_page": 50000}},
+        "result",
+        batches=batches,
+        prefetch=prefetch,
+        fields=fields,
     )
-    return float(param_req.json()["param_value"])
 
 
-@retry(stop=stop_after_attempt(5))
 def get_txs(height: int):
-    txs, new_txs = [], []
-    i = 1
-    while (new_txs is not None and len(new_txs)) or i == 1:
-        url = get_url()
-        txs_req = requests.post(
-            url=url + "blocktxs/",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "Accept: application/json",
-            },
-            data=json.dumps({"height": height, "page": i, "per_page": 50000}),
-            auth=AUTH,
-        )
-        new_txs = txs_req.json()["txs"]
-        if new_txs is not None and len(new_txs):
-            txs += new_txs
-        i += 1
-    return txs
+    return list(iter_txs(height, prefetch=PAGE_WORKERS))
 
 
-@retry(stop=stop_after_attempt(5))
 def get_claims(height: int, address: str = ""):
-    url = get_url()
-    claims_req = requests.post(
-        url=url + "nodeclaims/",
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "Accept: application/json",
-        },
-        data=json.dumps(
-            {"height": height, "page": 1, "per_page": 50000, "address": address}
+    return list(iter_claims(height, address, prefetch=PAGE_WORKERS))
+
+
+def get_account_txs(height: int, address: str = ""):
+    return list(iter_account_txs(height, address, prefetch=PAGE_WORKERS))
+
+
+def get_txs_frame(
+    height: int, columns: typing.Optional[typing.Iterable[str]] = None
+) -> pd.DataFrame:
+    """
+    Returns the txs of a block as a typed frame, decoding page by page and
+    reading only the fields of the txs the columns need
+    :param height:
+    :param columns: columns of tx_utils.TX_COLUMNS, all if None
+    """
+    columns = list(columns) if columns is not None else None
+    return decode_txs(
+        iter_txs(
+            height, batches=True, prefetch=PAGE_WORKERS, fields=get_tx_fields(columns)
         ),
-        auth=AUTH,
+        columns,
     )
-    total_pages = claims_req.json()["total_pages"]
-    claims = claims_req.json()["result"]
-    for i in range(2, total_pages + 1):
-        url = get_url()
-        claims_req = requests.post(
-            url=url + "nodeclaims/",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "Accept: application/json",
-            },
-            data=json.dumps(
-                {"height": height, "page": i, "per_page": 50000, "address": address}
-            ),
-            auth=AUTH,
-        )
-        new_claims = claims_req.json()["result"]
-        if new_claims is not None and len(new_claims):
-            claims += new_claims
-    return claims
 
 
-@retry(stop=stop_after_attempt(5))
-def get_account_txs(height: int, address: str = ""):
-    txs, new_txs = [], []
-    i = 1
-    while (new_txs is not None and len(new_txs)) or i == 1:
-        url = get_url()
-        txs_req = requests.post(
-            url=url + "accounttxs/",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "Accept: application/json",
-            },
-            data=json.dumps(
-                {"address": address, "height": height, "page": i, "per_page": 50000}
-            ),
-            auth=AUTH,
-        )
-        new_txs = txs_req.json()["txs"]
-        if new_txs is not None and len(new_txs):
-            txs += new_txs
-        i += 1
-    return txs
+def get_account_txs_frame(
+    height: int,
+    address: str = "",
+    columns: typing.Optional[typing.Iterable[str]] = None,
+) -> pd.DataFrame:
+    """
+    Same as get_txs_frame for the txs of an account
+    """
+    columns = list(columns) if columns is not None else None
+    return decode_txs(
+        iter_account_txs(
+            height,
+            address,
+            batches=True,
+            prefetch=PAGE_WORKERS,
+            fields=get_tx_fields(columns),
+        ),
+        columns,
+    )
 
 
-@retry(stop=stop_after_attempt(5))
 def get_nodes(height: int):
-    nodes, new_nodes = [], []
-    i = 1
-    while (new_nodes is not None and len(new_nodes)) or i == 1:
-        url = get_url()
-        nodes_req = requests.post(
-            url=url + "nodes/",
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "Accept: application/json",
-            },
-            data=json.dumps({"height": height, "opts": {"page": i, "per_page": 50000}}),
-            auth=AUTH,
-        )
-        new_nodes = nodes_req.json()["result"]
-        if new_nodes is not None and len(new_nodes):
-            nodes += new_nodes
-        i += 1
-    return nodes
+    return list(iter_nodes(height, prefetch=PAGE_WORKERS))
+
+
+# Parts of the bundles of iter_blocks -> fetches the part at a height
+BLOCK_PARTS = {
+    "block": get_block,
+    "txs": get_txs,
+    "claims": get_claims,
+}
+
+
+def get_block_bundle(height: int, include: typing.Iterable[str]) -> dict:
+    """
+    :return: dict, the height and every part of include at height
+    """
+    bundle = {"height": height}
+    for part in include:
+        bundle[part] = BLOCK_PARTS[part](height)
+    return bundle
+
+
+def read_checkpoint(path: str) -> typing.Optional[int]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["height"]
+
+
+def write_checkpoint(path: str, height: int):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"height": height}, f)
+    os.replace(tmp_path, path)
+
+
+def iter_blocks(
+    from_height: int,
+    to_height: int,
+    include: typing.Iterable[str] = ("block", "txs", "claims"),
+    window: int = 8,
+    checkpoint: typing.Optional[str] = None,
+) -> typing.Iterator[dict]:
+    """
+    Yields the bundles of the heights in [from_height, to_height] in height
+    order while fetching up to window heights ahead concurrently. A height is
+    only fetched once a bundle is consumed, so at most window bundles are held.
+    :param from_height:
+    :param to_height: included
+    :param include: parts of the bundles, keys of BLOCK_PARTS
+    :param window: max number of heights in flight
+    :param checkpoint: json file the last consumed height is saved to, the
+        iteration resumes after it if the file exists
+    :return: iterator of dicts with the height and every part of include
+    """
+    include = tuple(include)
+    unknown = [part for part in include if part not in BLOCK_PARTS]
+    if len(unknown):
+        raise ValueError(f"Unknown block parts: {unknown}")
+    if checkpoint is not None:
+        last_height = read_checkpoint(checkpoint)
+        if last_height is not None:
+            from_height = max(from_height, last_height + 1)
+
+    heights = iter(range(from_height, to_height + 1))
+    executor = ThreadPoolExecutor(max_workers=window)
+    futures = collections.deque()
+    try:
+        while True:
+            for height in itertools.islice(heights, window - len(futures)):
+                futures.append(executor.submit(get_block_bundle, height, include))
+            if not futures:
+                return
+            bundle = futures.popleft().result()
+            yield bundle
+            if checkpoint is not None:
+                write_checkpoint(checkpoint, bundle["height"])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 def get_inflation(height: int):
-    return get_supply(height) - get_supply(height - 1)
+    return int(get_inflation_series(height, height).iloc[0])
+
+
+def clear_supply_cache():
+    with SUPPLY_CACHE_LOCK:
+        SUPPLY_CACHE.clear()
+
+
+def get_supply_series(from_height: int, to_height: int, workers: int = 8) -> pd.Series:
+    """
+    Returns the total supply of every height in [from_height, to_height],
+    fetching the heights that aren't in SUPPLY_CACHE concurrently
+    :param from_height:
+    :param to_height: included
+    :param workers: max number of supply queries in flight
+    :return: pd.Series, int64 supply indexed by height
+    """
+    heights = range(from_height, to_height + 1)
+    with SUPPLY_CACHE_LOCK:
+        supplies = {height: SUPPLY_CACHE.get(height) for height in heights}
+        for height, supply in supplies.items():
+            if supply is not None:
+                SUPPLY_CACHE.move_to_end(height)
+    missing = [height for height, supply in supplies.items() if supply is None]
+    if len(missing):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            supplies.update(zip(missing, executor.map(get_supply, missing)))
+        with SUPPLY_CACHE_LOCK:
+            # Height 0 is the tip, its supply isn't final
+            SUPPLY_CACHE.update(
+                (height, supplies[height]) for height in missing if height > 0
+            )
+            while len(SUPPLY_CACHE) > SUPPLY_CACHE_SIZE:
+                SUPPLY_CACHE.popitem(last=False)
+    return pd.Series(
+        list(supplies.values()),
+        index=pd.RangeIndex(from_height, to_height + 1, name="height"),
+        dtype="int64",
+        name="supply",
+    )
+
+
+def get_inflation_series(
+    from_height: int, to_height: int, workers: int = 8
+) -> pd.Series:
+    """
+    Returns the inflation of every height in [from_height, to_height], the
+    supply of a height minus the supply of the height before
+    :param from_height:
+    :param to_height: included
+    :param workers: max number of supply queries in flight
+    :return: pd.Series, int64 inflation indexed by height
+    """
+    supply = get_supply_series(from_height - 1, to_height, workers=workers)
+    # Differences of int64 values, diff() would go through float64
+    inflation = supply.iloc[1:] - supply.iloc[:-1].to_numpy()
+    return inflation.rename("inflation")
 
 
 def get_address_from_pubkey(pubkey: str):
@@ -468,3 +1255,89 @@ def validate_private_key(private_key: str, address: str):
     ).hex()
     from_pk_address = get_address_from_pubkey(hex_public_key)
     return address == from_pk_address
+
+
+def to_raw_bytes(value: typing.Union[str, bytes]) -> bytes:
+    """
+    Returns raw bytes as is and hex strings, with or without 0x, decoded
+    """
+    if isinstance(value, (bytes, bytearray, memoryview, np.void)):
+        return bytes(value)
+    return bytes(hexbytes.HexBytes(value))
+
+
+def get_addresses_from_pubkeys(
+    pubkeys: typing.Iterable[typing.Union[str, bytes]], raw: bool = False
+) -> np.ndarray:
+    """
+    Converts many public keys to addresses
+    :param pubkeys: raw public keys or hex strings
+    :param raw: return the 20 raw bytes of the addresses instead of hex strings
+    :return: np.ndarray, dtype V20 if raw else U40, in the order of pubkeys.
+    bytes(addresses[i]) gives the 20 bytes of an address
+    """
+    sha256 = hashlib.sha256
+    # V20 rather than S20, which drops trailing zero bytes when read
+    addresses = np.fromiter(
+        (sha256(to_raw_bytes(pubkey)).digest()[:20] for pubkey in pubkeys),
+        dtype="V20",
+    )
+    if raw:
+        return addresses
+    return np.char.decode(
+        np.frombuffer(addresses.tobytes().hex().encode(), dtype="S40"), "ascii"
+    )
+
+
+def _validate_private_keys(
+    pairs: typing.List[typing.Tuple[typing.Union[str, bytes], typing.Union[str, bytes]]]
+) -> typing.List[bool]:
+    from_private_bytes = ed25519.Ed25519PrivateKey.from_private_bytes
+    raw_encoding, raw_format = (
+        serialization.Encoding.Raw,
+        serialization.PublicFormat.Raw,
+    )
+    mask = []
+    for private_key, address in pairs:
+        try:
+            public_key = (
+                from_private_bytes(to_raw_bytes(private_key)[:32])
+                .public_key()
+                .public_bytes(encoding=raw_encoding, format=raw_format)
+            )
+            address = to_raw_bytes(address)
+        except ValueError:
+            mask.append(False)
+            continue
+        mask.append(hashlib.sha256(public_key).digest()[:20] == address)
+    return mask
+
+
+def validate_private_keys(
+    pairs: typing.Iterable[
+        typing.Tuple[typing.Union[str, bytes], typing.Union[str, bytes]]
+    ],
+    processes: typing.Optional[int] = None,
+    chunk_size: int = 1000,
+) -> np.ndarray:
+    """
+    Validates many (private key, address) pairs, keys and addresses can be
+    raw bytes or hex strings. Malformed keys or addresses are invalid.
+    :param pairs:
+    :param processes: spread the pairs over a pool of this many processes,
+    validated in this process if None
+    :param chunk_size: pairs sent to a process at a time
+    :return: np.ndarray, bool mask of the valid pairs in the order of pairs
+    """
+    pairs = list(pairs)
+    if processes is None:
+        mask = _validate_private_keys(pairs)
+    else:
+        chunks = [pairs[i : i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            mask = list(
+                itertools.chain.from_iterable(
+                    executor.map(_validate_private_keys, chunks)
+                )
+            )
+    return np.array(mask, dtype=bool)
@@ -18,8 +18,11 @@ setup(
         "pycoingecko",
         "pika",
         "pandas",
+        "numpy",
         "logaugment",
+        "aiohttp",
     ],
+    extras_require={"fast": ["orjson", "ijson"], "async": ["asyncpg"]},
     test_suite="testing",
     tests_require=["nose"],
     zip_safe=False,